@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ.setdefault("MY_NOTES_ASYNC_VIEWS", "1")
 
-application = get_asgi_application()
+# What django.core.asgi.get_asgi_application() does, with the handler that
+# streams response bodies from the ORM thread pool.
+django.setup(set_prefix=False)
+
+from my_notes.async_views import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
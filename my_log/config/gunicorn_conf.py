@@ -0,0 +1,57 @@
+"""
+Gunicorn config for serving the project in production.
+
+Run it from the directory holding manage.py:
+    gunicorn -c python:config.gunicorn_conf
+
+Every value below can be overridden through the GUNICORN_* environment
+variables; GUNICORN_ASGI=1 serves config.asgi with uvicorn workers instead of
+config.wsgi with threaded workers.
+
+For more information on these settings, see
+https://docs.gunicorn.org/en/20.1.0/settings.html
+"""
+
+import multiprocessing
+import os
+
+ASGI = os.environ.get("GUNICORN_ASGI", "0") == "1"
+CPU_COUNT = multiprocessing.cpu_count()
+
+wsgi_app = "config.asgi:application" if ASGI else "config.wsgi:application"
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+# A uvicorn worker multiplexes requests on its event loop, so one per core is
+# enough; threaded WSGI workers follow the usual (2 x cores) + 1 rule.
+worker_class = "uvicorn.workers.UvicornWorker" if ASGI else "gthread"
+workers = int(
+    os.environ.get("GUNICORN_WORKERS", CPU_COUNT if ASGI else CPU_COUNT * 2 + 1)
+)
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# Import Django once in the master so workers fork with the code already loaded.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# Recycle workers now and then so a slow leak can't grow without bound; the
+# jitter keeps them from all restarting at once.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# Behind a load balancer, keep idle connections open a little longer than it does.
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# Worker heartbeats go to a tmpfs when there is one (e.g. inside Docker).
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # Never share a database connection opened by the master with the workers.
+    from django.db import connections
+
+    connections.close_all()
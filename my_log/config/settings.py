@@ -45,11 +45,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "my_notes.middleware.StaticFilesMiddleware",
+    "my_notes.middleware.CompressionMiddleware",
+    "my_notes.middleware.ServerTimingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "my_notes.middleware.AnonymousPageCacheMiddleware",
+    "users.middleware.CachedAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "my_notes.middleware.ReplicaMiddleware",
+    "my_notes.middleware.ShardMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.middleware.security.SecurityMiddleware",
 ]
@@ -82,9 +88,108 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Keep connections open between requests, in seconds (0 closes them).
+        "CONN_MAX_AGE": int(os.environ.get("CONN_MAX_AGE", 600)),
     }
 }
 
+# Read-only copies of the default database, as comma-separated SQLite paths.
+# They are refreshed with "manage.py sync_replicas".
+MY_NOTES_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICAS", "").split(",")), 1
+):
+    MY_NOTES_REPLICAS.append(f"replica{number}")
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "NAME": BASE_DIR / path,
+        "TEST": {"MIRROR": "default"},
+    }
+
+# Databases holding the my_notes tables, partitioned by owner, as
+# comma-separated SQLite paths; "default" names the default database. Users,
+# sessions and the other tables stay in the default database.
+MY_NOTES_SHARDS = []
+for number, path in enumerate(
+    filter(None, os.environ.get("DATABASE_SHARDS", "").split(",")), 1
+):
+    if path == "default":
+        MY_NOTES_SHARDS.append("default")
+        continue
+    MY_NOTES_SHARDS.append(f"shard{number}")
+    DATABASES[f"shard{number}"] = {**DATABASES["default"], "NAME": BASE_DIR / path}
+
+DATABASE_ROUTERS = ["my_notes.routers.ShardRouter", "my_notes.routers.ReplicaRouter"]
+
+# PRAGMAs run on every new SQLite connection, see my_notes.signals.
+# WAL lets readers continue while one writer commits; busy_timeout makes a
+# writer wait for the lock instead of failing with "database is locked".
+SQLITE_PROFILES = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+
+SQLITE_PRAGMAS = SQLITE_PROFILES[os.environ.get("SQLITE_PROFILE", "production")]
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", ""),
+    "file": (
+        "django.core.cache.backends.filebased.FileBasedCache",
+        os.path.join(BASE_DIR, "cache"),
+    ),
+    "memcached": (
+        "django.core.cache.backends.memcached.PyMemcacheCache",
+        "127.0.0.1:11211",
+    ),
+    # Any Redis-compatible server, through the django-redis package.
+    "redis": ("django_redis.cache.RedisCache", "redis://127.0.0.1:6379/1"),
+}
+
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[
+    os.environ.get("CACHE_BACKEND", "locmem")
+]
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": os.environ.get("CACHE_LOCATION", CACHE_LOCATION),
+    }
+}
+
+# A locmem cache is private to each worker process, so a logout or password
+# change there would not evict the cached session and user in the others.
+SHARED_CACHE = CACHE_BACKEND != CACHE_BACKENDS["locmem"][0]
+
+
+# Sessions
+# https://docs.djangoproject.com/en/3.2/topics/http/sessions/
+
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+
+SESSION_ENGINE = SESSION_ENGINES[
+    os.environ.get("SESSION_BACKEND", "cached_db" if SHARED_CACHE else "db")
+]
+
+# Seconds the signed-in User is cached, see users.middleware; 0 turns it off.
+USER_CACHE_TIMEOUT = int(
+    os.environ.get("USER_CACHE_TIMEOUT", 60 if SHARED_CACHE else 0)
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -124,6 +229,11 @@ USE_TZ = True
 
 STATIC_URL = "/static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
+STATICFILES_DIRS = [os.path.join(BASE_DIR, "config/static")]
+
+# collectstatic fingerprints the files and writes gzip and brotli copies, which
+# WhiteNoiseMiddleware serves with far-future immutable Cache-Control headers.
+STATICFILES_STORAGE = "my_notes.storage.VersionedStaticFilesStorage"
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -134,9 +244,43 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 LOGIN_REDIRECT_URL = "/"
 
-BOOTSTRAP3 = {
-    "include_jquery": True,
-}
+# Anonymous visitors (and "?public" requests) see every user's topics.
+MY_NOTES_PUBLIC_TOPICS = os.environ.get("MY_NOTES_PUBLIC_TOPICS", "1") == "1"
+
+# Serve the read views from my_notes.async_views; config.asgi turns this on.
+MY_NOTES_ASYNC_VIEWS = os.environ.get("MY_NOTES_ASYNC_VIEWS", "0") == "1"
+
+# Threads that run ORM work for the async views, per process.
+MY_NOTES_ASYNC_ORM_THREADS = int(os.environ.get("MY_NOTES_ASYNC_ORM_THREADS", 8))
+
+# Lifetime of the rendered entry fragments on the topic page, in seconds.
+MY_NOTES_FRAGMENT_CACHE_TIMEOUT = int(
+    os.environ.get("MY_NOTES_FRAGMENT_CACHE_TIMEOUT", 60 * 60 * 24)
+)
+
+# Visitors read from the default database for this long after they write.
+MY_NOTES_REPLICA_STICKY_COOKIE = "read_primary"
+MY_NOTES_REPLICA_STICKY_SECONDS = int(
+    os.environ.get("MY_NOTES_REPLICA_STICKY_SECONDS", 10)
+)
+
+# Seconds anonymous visitors get cached copies of these pages; 0 turns it off.
+MY_NOTES_ANONYMOUS_CACHE_TIMEOUT = int(
+    os.environ.get("MY_NOTES_ANONYMOUS_CACHE_TIMEOUT", 300)
+)
+MY_NOTES_ANONYMOUS_CACHE_VIEWS = ["my_notes:index", "users:login", "users:register"]
+# Query parameters that may vary a cached page; requests with others, like
+# the login page's ?next=, are not cached.
+MY_NOTES_ANONYMOUS_CACHE_PARAMS = ["page", "after", "before"]
+
+# Compress responses with brotli or gzip, see my_notes.middleware.
+MY_NOTES_COMPRESSION = os.environ.get("MY_NOTES_COMPRESSION", "1") == "1"
+
+# Send Server-Timing headers and log per-request database, view and render times.
+MY_NOTES_SERVER_TIMING = os.environ.get("MY_NOTES_SERVER_TIMING", "0") == "1"
+
+# Days the changes feed keeps tombstones, see the prune_tombstones command.
+MY_NOTES_TOMBSTONE_DAYS = int(os.environ.get("MY_NOTES_TOMBSTONE_DAYS", 90))
 
 # Heroku settings
 
@@ -148,18 +292,15 @@ if cwd == "/app" or cwd[:4] == "/tmp":
 
     DEBUG = False
 
-    DATABASES = {"default": dj_database_url.config(default="postgres://localhost")}
+    DATABASES = {
+        "default": dj_database_url.config(
+            default="postgres://localhost",
+            conn_max_age=int(os.environ.get("CONN_MAX_AGE", 600)),
+        )
+    }
 
     # Header 'X-Forwarded-Proto' for request.is_secure().
     SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
     # All hosts headers are allowed
     ALLOWED_HOSTS = ["*"]
-
-    # Static resources config
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    STATIC_ROOT = os.path.join(BASE_DIR, "static")
-    STATIC_URL = "/static/"
-    # Extra places for collectstatic to find static files.
-    STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
-    STATIC_FILES_DIRS = (os.path.join(BASE_DIR, "static"),)
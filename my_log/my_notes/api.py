@@ -0,0 +1,53 @@
+"""Helpers for the JSON read API in views.py."""
+import datetime
+import json
+
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TOPIC_FIELDS = ("id", "text", "date_added", "entry_count", "last_entry_at")
+ENTRY_FIELDS = ("id", "topic_id", "date_added", "preview", "text", "html")
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def selected_fields(value, allowed):
+    """Parse a ``?fields=a,b`` value; every allowed field if it is empty."""
+    if not value:
+        return allowed
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(",")))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(unknown)}.")
+    return fields
+
+
+def _default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat().replace("+00:00", "Z")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(data):
+    """Serialize to compact JSON bytes, with orjson if it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_UTC_Z)
+    return json.dumps(data, default=_default, separators=(",", ":")).encode()
+
+
+class JsonResponse(HttpResponse):
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(dumps(data), **kwargs)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MyNotesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "my_notes"
+
+    def ready(self):
+        from . import signals  # noqa: F401
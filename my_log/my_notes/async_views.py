@@ -0,0 +1,167 @@
+"""Async variants of the read views, used when the project runs under ASGI.
+
+The ORM is synchronous, so all database work (the session and user lookup,
+the page queries and the template render, which may evaluate lazy querysets)
+runs in a bounded thread pool while the event loop keeps serving other
+clients. The pool size also caps the number of database connections.
+config.asgi serves the project with the ASGIHandler below, which produces
+streaming bodies such as the export in the pool as well.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers import asgi
+from django.db import close_old_connections
+
+from . import views
+from .middleware import time_queries
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.MY_NOTES_ASYNC_ORM_THREADS, thread_name_prefix="my_notes_orm"
+)
+
+
+def _call(func, *args, **kwargs):
+    # Pool threads outlive requests, so apply CONN_MAX_AGE like Django does
+    # at the start and the end of every request.
+    close_old_connections()
+    try:
+        with time_queries():
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Carry context variables, such as my_notes.routers.replica_reads, over.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, functools.partial(context.run, _call, func, *args, **kwargs)
+    )
+
+
+async def iterate_in_pool(iterable, buffer=4):
+    """Iterate ``iterable`` in the ORM thread pool and yield its items.
+
+    The pool thread hands the items over through an asyncio queue, so waiting
+    for the next one never blocks the event loop; a full queue blocks the pool
+    thread instead. A client that goes away stops the pool thread at the next
+    item.
+    """
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue(maxsize=buffer)
+    stopped = threading.Event()
+    done = object()
+
+    def offer(item):
+        future = asyncio.run_coroutine_threadsafe(items.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=1)
+                return True
+            except concurrent.futures.TimeoutError:
+                if stopped.is_set():
+                    future.cancel()
+                    return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not offer(item):
+                    return
+        except Exception as error:
+            offer((done, error))
+        else:
+            offer((done, None))
+
+    context = contextvars.copy_context()
+    loop.run_in_executor(executor, functools.partial(context.run, _call, produce))
+    try:
+        while True:
+            item = await items.get()
+            if isinstance(item, tuple) and item[0] is done:
+                if item[1] is not None:
+                    raise item[1]
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """Django's ASGI handler, streaming response bodies from the ORM pool.
+
+    Django 3.2 iterates streaming responses in the event loop, where the ORM
+    refuses to run and where waiting on a slow body would stall every other
+    client of the worker.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [
+            (header.encode("ascii"), value.encode("latin1"))
+            for header, value in response.items()
+        ]
+        headers += [
+            (b"Set-Cookie", cookie.output(header="").encode("ascii").strip())
+            for cookie in response.cookies.values()
+        ]
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": headers,
+            }
+        )
+        # Iterate the response and not streaming_content, like Django does.
+        async for part in iterate_in_pool(response):
+            for chunk, _ in self.chunk_bytes(part):
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": True}
+                )
+        await send({"type": "http.response.body"})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def _render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, "render") and callable(response.render):
+        response.render()
+    return response
+
+
+def async_login_required(view, login_url="/users/login/"):
+    @functools.wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        authenticated = await run_in_pool(lambda: request.user.is_authenticated)
+        if not authenticated:
+            return redirect_to_login(request.get_full_path(), login_url)
+        return await view(request, *args, **kwargs)
+
+    return wrapped
+
+
+def async_read_view(view):
+    """Serve the synchronous ``view`` from the ORM thread pool."""
+
+    @functools.wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        return await run_in_pool(_render, view, request, *args, **kwargs)
+
+    return wrapped
+
+
+# Django 3.2 only runs function-based views natively as coroutines.
+index = async_read_view(views.Index.as_view())
+topics = async_read_view(views.Topics.as_view())
+theme = async_login_required(async_read_view(views.Theme.as_view()))
+export = async_read_view(views.Export.as_view())
@@ -0,0 +1,45 @@
+import json
+import subprocess
+import time
+
+from django.conf import settings
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of ``samples``, or None when there are none."""
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def latency_summary(seconds):
+    """Summarize request durations given in seconds as milliseconds."""
+    return {
+        f"{name}_ms": round((percentile(seconds, fraction) or 0) * 1000, 3)
+        for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+    }
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "time": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def save_results(path, results):
+    with open(path, "w") as stream:
+        json.dump(results, stream, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path) as stream:
+        return json.load(stream)
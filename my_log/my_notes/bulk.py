@@ -0,0 +1,44 @@
+from collections import defaultdict
+
+from django.db import connections
+from django.db.models import Max
+
+from . import search, sync
+from .models import Entry, Topic
+
+
+def insert_entries(entries, using="default"):
+    """Insert unsaved entries with one bulk_create and return their ids.
+
+    bulk_create() sends no signals, so this applies what the Entry signals do
+    for a single save: change sequence, rendered text, search index, topic
+    counters and the topic version. Call it inside a transaction.
+    """
+    if not entries:
+        return []
+    last_seq = sync.next_seq(using, len(entries))
+    for seq, entry in enumerate(entries, start=last_seq - len(entries) + 1):
+        entry.render_text()
+        entry.seq = seq
+    last_id = None
+    if not connections[using].features.can_return_rows_from_bulk_insert:
+        last_id = Entry.objects.using(using).aggregate(last=Max("id"))["last"] or 0
+    entries = Entry.objects.using(using).bulk_create(entries)
+    if last_id is None:
+        entry_ids = [entry.pk for entry in entries]
+    else:
+        entry_ids = list(
+            Entry.objects.using(using)
+            .filter(id__gt=last_id, topic_id__in={e.topic_id for e in entries})
+            .values_list("id", flat=True)
+        )
+    search.index_entries(entry_ids, using=using)
+
+    by_topic = defaultdict(list)
+    for entry in entries:
+        by_topic[entry.topic_id].append(entry.date_added)
+    for topic_id, dates in by_topic.items():
+        Topic.objects.using(using).filter(pk=topic_id).entries_added(
+            len(dates), max(dates)
+        )
+    return entry_ids
@@ -0,0 +1,139 @@
+"""Streaming exports of a user's learning log.
+
+Every exporter is a generator of byte chunks fed by QuerySet.iterator(), so an
+export holds one chunk of entries in memory however large the log is. Topics
+without entries follow the entries, as records without an id and a text.
+"""
+import csv
+import json
+import zipfile
+
+from django.utils.text import slugify
+
+from .models import Entry, Topic
+
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "markdown": ("application/zip", "zip"),
+}
+
+
+def user_entries(user, chunk_size=CHUNK_SIZE):
+    # Routed by the user hint: streaming outlives the request's shard scope.
+    return (
+        Entry.objects.db_manager(hints={"instance": user})
+        .filter(owner=user)
+        .select_related("topic")
+        .only("id", "text", "date_added", "topic__id", "topic__text")
+        .order_by("topic_id", "date_added", "id")
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def empty_topics(user, chunk_size=CHUNK_SIZE):
+    return (
+        Topic.objects.db_manager(hints={"instance": user})
+        .filter(owner=user, topic__isnull=True)
+        .only("id", "text", "date_added")
+        .order_by("id")
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def export_ndjson(entries, topics=()):
+    for entry in entries:
+        record = {
+            "id": entry.id,
+            "topic_id": entry.topic.id,
+            "topic": entry.topic.text,
+            "text": entry.text,
+            "date_added": entry.date_added.isoformat(),
+        }
+        yield (json.dumps(record, ensure_ascii=False) + "\n").encode()
+    for topic in topics:
+        record = {
+            "id": None,
+            "topic_id": topic.id,
+            "topic": topic.text,
+            "text": None,
+            "date_added": topic.date_added.isoformat(),
+        }
+        yield (json.dumps(record, ensure_ascii=False) + "\n").encode()
+
+
+class _Pipe:
+    """Write-only file object whose content is collected with drain()."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data) if not isinstance(data, str) else data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+def export_csv(entries, topics=()):
+    pipe = _Pipe()
+    writer = csv.writer(pipe)
+    writer.writerow(["id", "topic_id", "topic", "text", "date_added"])
+    for entry in entries:
+        writer.writerow(
+            [
+                entry.id,
+                entry.topic.id,
+                entry.topic.text,
+                entry.text,
+                entry.date_added.isoformat(),
+            ]
+        )
+        for chunk in pipe.drain():
+            yield chunk.encode()
+    for topic in topics:
+        writer.writerow(["", topic.id, topic.text, "", topic.date_added.isoformat()])
+        for chunk in pipe.drain():
+            yield chunk.encode()
+
+
+def export_markdown(entries, topics=()):
+    """Yield a zip archive holding one Markdown file per topic."""
+    pipe = _Pipe()
+    archive = zipfile.ZipFile(pipe, mode="w", compression=zipfile.ZIP_DEFLATED)
+    topic_file, topic_id = None, None
+    for entry in entries:
+        if entry.topic.id != topic_id:
+            if topic_file:
+                topic_file.close()
+            topic_id = entry.topic.id
+            name = f"{slugify(entry.topic.text) or 'topic'}-{topic_id}.md"
+            topic_file = archive.open(name, mode="w")
+            topic_file.write(f"# {entry.topic.text}\n".encode())
+        topic_file.write(
+            f"\n## {entry.date_added:%b %d, %Y %H:%M}\n\n{entry.text}\n".encode()
+        )
+        yield from pipe.drain()
+    if topic_file:
+        topic_file.close()
+    for topic in topics:
+        name = f"{slugify(topic.text) or 'topic'}-{topic.id}.md"
+        with archive.open(name, mode="w") as topic_file:
+            topic_file.write(f"# {topic.text}\n".encode())
+        yield from pipe.drain()
+    archive.close()
+    yield from pipe.drain()
+
+
+EXPORTERS = {
+    "ndjson": export_ndjson,
+    "csv": export_csv,
+    "markdown": export_markdown,
+}
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from my_notes.models import Entry
+
+
+class Command(BaseCommand):
+    help = "Fill Entry.html and Entry.preview for rows saved before they existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to update, e.g. one shard of MY_NOTES_SHARDS.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-render every entry, not only the ones without HTML.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size, db = options["batch_size"], options["database"]
+        entries = Entry.objects.using(db).only("id", "text").order_by("id")
+        if not options["all"]:
+            entries = entries.filter(html="")
+        last_id, updated = 0, 0
+        while True:
+            batch = list(entries.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            for entry in batch:
+                entry.render_text()
+            with transaction.atomic(using=db):
+                Entry.objects.using(db).bulk_update(batch, ["html", "preview"])
+            last_id = batch[-1].id
+            updated += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Rendered {updated} entries."))
@@ -0,0 +1,149 @@
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from my_notes.benchmarks import latency_summary, run_metadata, save_results
+from my_notes.models import Topic
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare one gunicorn worker serving config.wsgi with one serving "
+        "config.asgi, under the same concurrent load on the current database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="User whose pages to load.")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--duration", type=float, default=10, help="Seconds.")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--threads", type=int, default=4, help="WSGI threads.")
+        parser.add_argument("--output", help="Write the results as JSON here.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+        topic = Topic.objects.filter(owner=user).order_by("-entry_count").first()
+        paths = [reverse("my_notes:index"), reverse("my_notes:topics")]
+        if topic is not None:
+            paths.append(reverse("my_notes:topic", args=(topic.id,)))
+        cookie = f"{settings.SESSION_COOKIE_NAME}={self.session_for(user)}"
+
+        results = {"meta": run_metadata()}
+        for mode in ("wsgi", "asgi"):
+            server = self.start_server(mode, options)
+            try:
+                results[mode] = self.load(paths, cookie, options)
+            finally:
+                server.terminate()
+                server.wait()
+            self.report(mode, results[mode])
+        if options["output"]:
+            save_results(options["output"], results)
+
+    def session_for(self, user):
+        session = import_string(f"{settings.SESSION_ENGINE}.SessionStore")()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
+
+    def start_server(self, mode, options):
+        env = {
+            **os.environ,
+            "GUNICORN_ASGI": "1" if mode == "asgi" else "0",
+            "GUNICORN_WORKERS": "1",
+            "GUNICORN_THREADS": str(options["threads"]),
+            "GUNICORN_ACCESS_LOG": "",
+        }
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "-c",
+                "python:config.gunicorn_conf",
+                "--bind",
+                f"127.0.0.1:{options['port']}",
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", options["port"]), 1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"The {mode} server did not start.")
+
+    def load(self, paths, cookie, options):
+        latencies, errors = [], []
+        lock = threading.Lock()
+        stop_at = time.monotonic() + options["duration"]
+
+        def client(number):
+            connection = http.client.HTTPConnection("127.0.0.1", options["port"])
+            path_index = number
+            while time.monotonic() < stop_at:
+                path = paths[path_index % len(paths)]
+                path_index += 1
+                started = time.perf_counter()
+                try:
+                    connection.request("GET", path, headers={"Cookie": cookie})
+                    response = connection.getresponse()
+                    response.read()
+                    failed = response.status >= 400
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    failed = True
+                with lock:
+                    if failed:
+                        errors.append(path)
+                    else:
+                        latencies.append(time.perf_counter() - started)
+            connection.close()
+
+        started = time.monotonic()
+        clients = [
+            threading.Thread(target=client, args=(number,))
+            for number in range(options["concurrency"])
+        ]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = time.monotonic() - started
+        return {
+            "requests": len(latencies),
+            "errors": len(errors),
+            "requests_per_second": len(latencies) / elapsed,
+            "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0,
+            **latency_summary(latencies),
+        }
+
+    def report(self, mode, result):
+        self.stdout.write(
+            f"{mode}: {result['requests_per_second']:.1f} req/s, "
+            f"p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, "
+            f"p99 {result['p99_ms']:.1f} ms, {result['errors']} errors"
+        )
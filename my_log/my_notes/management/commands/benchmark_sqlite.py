@@ -0,0 +1,132 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from my_notes.benchmarks import latency_summary, run_metadata, save_results
+from my_notes.sqlite import apply_pragmas
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent read/write throughput of a scratch SQLite database "
+        "with and without the SQLite PRAGMA profiles from settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--duration", type=float, default=5, help="Seconds.")
+        parser.add_argument("--rows", type=int, default=20000)
+        parser.add_argument(
+            "--profile",
+            action="append",
+            choices=sorted(settings.SQLITE_PROFILES),
+            help="Profiles to compare (default: all of them).",
+        )
+        parser.add_argument("--output", help="Write the results as JSON here.")
+
+    def handle(self, *args, **options):
+        results = {"meta": run_metadata()}
+        for profile in options["profile"] or sorted(settings.SQLITE_PROFILES):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "benchmark.sqlite3")
+                pragmas = settings.SQLITE_PROFILES[profile]
+                self.create_database(path, pragmas, options["rows"])
+                results[profile] = self.load(path, pragmas, options)
+            self.report(profile, results[profile])
+        if options["output"]:
+            save_results(options["output"], results)
+
+    def connect(self, path, pragmas):
+        # Django's default: autocommit handled by the caller, 5 second timeout.
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        apply_pragmas(connection, pragmas)
+        return connection
+
+    def create_database(self, path, pragmas, rows):
+        connection = self.connect(path, pragmas)
+        connection.execute(
+            "CREATE TABLE entry (id INTEGER PRIMARY KEY, topic_id INTEGER, "
+            "text TEXT, date_added REAL)"
+        )
+        connection.execute("CREATE INDEX entry_topic ON entry (topic_id, id)")
+        connection.execute("BEGIN")
+        connection.executemany(
+            "INSERT INTO entry (topic_id, text, date_added) VALUES (?, ?, ?)",
+            ((n % 100, "x" * 400, time.time()) for n in range(rows)),
+        )
+        connection.execute("COMMIT")
+        connection.close()
+
+    def load(self, path, pragmas, options):
+        stats = {"read": [], "write": [], "locked": 0}
+        lock = threading.Lock()
+        stop_at = time.monotonic() + options["duration"]
+
+        def worker(kind, seed):
+            rng = random.Random(seed)
+            connection = self.connect(path, pragmas)
+            durations, locked = [], 0
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                try:
+                    if kind == "read":
+                        connection.execute(
+                            "SELECT id, text FROM entry WHERE topic_id = ? "
+                            "ORDER BY id DESC LIMIT 20",
+                            (rng.randrange(100),),
+                        ).fetchall()
+                    else:
+                        connection.execute("BEGIN IMMEDIATE")
+                        connection.execute(
+                            "INSERT INTO entry (topic_id, text, date_added) "
+                            "VALUES (?, ?, ?)",
+                            (rng.randrange(100), "y" * 400, time.time()),
+                        )
+                        connection.execute("COMMIT")
+                except sqlite3.OperationalError:
+                    if connection.in_transaction:
+                        connection.execute("ROLLBACK")
+                    locked += 1
+                    continue
+                durations.append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                stats[kind].extend(durations)
+                stats["locked"] += locked
+
+        threads = [
+            threading.Thread(target=worker, args=("read", n))
+            for n in range(options["readers"])
+        ] + [
+            threading.Thread(target=worker, args=("write", -n - 1))
+            for n in range(options["writers"])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        return {
+            "reads_per_second": len(stats["read"]) / elapsed,
+            "writes_per_second": len(stats["write"]) / elapsed,
+            "locked_errors": stats["locked"],
+            "read": latency_summary(stats["read"]),
+            "write": latency_summary(stats["write"]),
+        }
+
+    def report(self, profile, result):
+        self.stdout.write(
+            f"{profile}: {result['reads_per_second']:.0f} reads/s "
+            f"(p99 {result['read']['p99_ms']:.2f} ms), "
+            f"{result['writes_per_second']:.0f} writes/s "
+            f"(p99 {result['write']['p99_ms']:.2f} ms), "
+            f"{result['locked_errors']} locked errors"
+        )
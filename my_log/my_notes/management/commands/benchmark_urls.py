@@ -0,0 +1,206 @@
+import statistics
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from my_notes import sharding
+from my_notes import urls as my_notes_urls
+from my_notes.benchmarks import (
+    latency_summary,
+    load_results,
+    run_metadata,
+    save_results,
+)
+from my_notes.models import Entry, Topic
+from users import urls as users_urls
+
+from .seed_benchmark import PASSWORD
+
+# Extra requests besides a GET of every named route.
+WRITES = {
+    "my_notes:new_entry": {"text": "benchmark entry"},
+    "my_notes:edit_entry": {"text": "benchmark edit"},
+}
+QUERY_STRINGS = {"my_notes:search": {"q": "django cache"}}
+# Routes that would end the benchmark user's session are loaded anonymously.
+ANONYMOUS = {"users:logout", "users:login", "users:register"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every route of my_notes and users through the test client and "
+        "report p50/p95/p99 latency, SQL queries and response bytes. Without "
+        "--seed it runs in a transaction that is rolled back at the end, so the "
+        "benchmark's writes don't stay in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", default="bench0", help="User to log in as.")
+        parser.add_argument("--password", default=PASSWORD)
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--output", help="Write the results as JSON here.")
+        parser.add_argument("--compare", help="Earlier JSON results to diff against.")
+        parser.add_argument(
+            "--seed",
+            metavar="USERS,TOPICS,ENTRIES",
+            help="Run against a throw-away database seeded with seed_benchmark.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["seed"]:
+            aliases = {"default", *settings.MY_NOTES_SHARDS}
+            with ExitStack() as stack:
+                for alias in aliases:
+                    stack.enter_context(transaction.atomic(using=alias))
+                self.benchmark(options)
+                for alias in aliases:
+                    transaction.set_rollback(True, using=alias)
+            return
+        try:
+            users, topics, entries = (int(n) for n in options["seed"].split(","))
+        except ValueError:
+            raise CommandError("--seed takes three numbers, e.g. 10,20,500.")
+        old_names = {
+            alias: connections[alias].creation.create_test_db(
+                verbosity=0, autoclobber=True
+            )
+            for alias in {"default", *settings.MY_NOTES_SHARDS}
+        }
+        try:
+            call_command(
+                "seed_benchmark",
+                users=users,
+                topics=topics,
+                entries=entries,
+                stdout=self.stdout,
+            )
+            self.benchmark(options)
+        finally:
+            for alias, old_name in old_names.items():
+                connections[alias].creation.destroy_test_db(old_name, verbosity=0)
+
+    def routes(self):
+        for module in (my_notes_urls, users_urls):
+            for pattern in module.urlpatterns:
+                if pattern.name:
+                    yield f"{module.app_name}:{pattern.name}", pattern.pattern
+
+    def route_kwargs(self, user):
+        topic = Topic.objects.filter(owner=user).order_by("-entry_count").first()
+        if topic is None:
+            raise CommandError(f"{user} has no topics; run seed_benchmark first.")
+        entry = Entry.objects.filter(topic=topic).order_by("-id").first()
+        return {
+            "topic_id": topic.id,
+            "entry_id": entry.id,
+            "pk": entry.id,
+            "file_format": "ndjson",
+        }
+
+    def benchmark(self, options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+        client = Client(SERVER_NAME="localhost")
+        if not client.login(username=user.username, password=options["password"]):
+            raise CommandError(f"Could not log in as {user}.")
+        anonymous = Client(SERVER_NAME="localhost")
+        with sharding.owner_scope(user):
+            values = self.route_kwargs(user)
+
+        requests = []
+        for name, pattern in self.routes():
+            kwargs = {key: values[key] for key in pattern.converters}
+            url = reverse(name, kwargs=kwargs)
+            agent = anonymous if name in ANONYMOUS else client
+            requests.append(("GET", name, agent, url, QUERY_STRINGS.get(name)))
+            if name in WRITES:
+                requests.append(("POST", name, agent, url, WRITES[name]))
+
+        results = {
+            "meta": {
+                **run_metadata(),
+                "user": user.username,
+                "topics": sum(
+                    Topic.objects.using(db).count() for db in sharding.databases()
+                ),
+                "entries": sum(
+                    Entry.objects.using(db).count() for db in sharding.databases()
+                ),
+                "iterations": options["iterations"],
+            },
+            "routes": {},
+        }
+        for method, name, agent, url, data in requests:
+            key = f"{method} {name}"
+            results["routes"][key] = self.measure(
+                getattr(agent, method.lower()), url, data, options
+            )
+            self.report(key, results["routes"][key])
+
+        if options["output"]:
+            save_results(options["output"], results)
+        if options["compare"]:
+            self.compare(load_results(options["compare"]), results)
+
+    def measure(self, send, url, data, options):
+        for _ in range(options["warmup"]):
+            self.consume(send(url, data))
+        durations, queries, sizes, statuses = [], [], [], set()
+        for _ in range(options["iterations"]):
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(CaptureQueriesContext(connection))
+                    for connection in connections.all()
+                ]
+                started = time.perf_counter()
+                response = send(url, data)
+                size = self.consume(response)
+                durations.append(time.perf_counter() - started)
+            queries.append(sum(len(context) for context in captured))
+            sizes.append(size)
+            statuses.add(response.status_code)
+        return {
+            "url": url,
+            "status": sorted(statuses),
+            "queries": max(queries),
+            "bytes": round(statistics.fmean(sizes)),
+            "mean_ms": round(statistics.fmean(durations) * 1000, 3),
+            **latency_summary(durations),
+        }
+
+    def consume(self, response):
+        if response.streaming:
+            return sum(len(chunk) for chunk in response.streaming_content)
+        return len(response.content)
+
+    def report(self, key, result):
+        self.stdout.write(
+            f"{key:<32} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms"
+            f"  p99 {result['p99_ms']:8.2f} ms  {result['queries']:3} queries"
+            f"  {result['bytes']:>9} bytes  {result['status']}"
+        )
+
+    def compare(self, before, after):
+        self.stdout.write(f"\nCompared with {before['meta'].get('commit')}:")
+        for key, result in after["routes"].items():
+            old = before["routes"].get(key)
+            if old is None:
+                continue
+            change = (
+                (result["p95_ms"] / old["p95_ms"] - 1) * 100 if old["p95_ms"] else 0
+            )
+            self.stdout.write(
+                f"{key:<32} p95 {old['p95_ms']:8.2f} -> {result['p95_ms']:8.2f} ms "
+                f"({change:+.0f}%)  queries {old['queries']} -> {result['queries']}"
+            )
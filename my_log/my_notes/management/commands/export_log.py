@@ -0,0 +1,35 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from my_notes import export
+
+
+class Command(BaseCommand):
+    help = "Export a user's topics and entries as NDJSON, CSV or zipped Markdown."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Owner's username.")
+        parser.add_argument("--format", choices=export.EXPORTERS, default="ndjson")
+        parser.add_argument(
+            "--output", default="-", help='Output file, or "-" for standard output.'
+        )
+        parser.add_argument("--chunk-size", type=int, default=export.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+        entries = export.user_entries(user, chunk_size=options["chunk_size"])
+        topics = export.empty_topics(user, chunk_size=options["chunk_size"])
+        chunks = export.EXPORTERS[options["format"]](entries, topics)
+        if options["output"] == "-":
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        with open(options["output"], "wb") as stream:
+            for chunk in chunks:
+                stream.write(chunk)
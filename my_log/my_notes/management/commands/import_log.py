@@ -0,0 +1,120 @@
+import csv
+import json
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+
+from my_notes.bulk import insert_entries
+from my_notes.forms import EntryForm, TopicForm
+from my_notes.models import Topic
+
+
+class Command(BaseCommand):
+    help = (
+        "Import topics and entries for a user from a JSONL or CSV file. "
+        'Every record needs a "topic" and a "text" value; a null text, or an '
+        "empty id and text in CSV, as export_log writes them, adds an empty topic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='Input file, or "-" for standard input.')
+        parser.add_argument("--user", required=True, help="Owner's username.")
+        parser.add_argument("--format", choices=["jsonl", "csv"])
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            self.user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+        path = options["path"]
+        file_format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        self.batch_size = options["batch_size"]
+        self.db = router.db_for_write(Topic, instance=self.user)
+        self.topics = dict(
+            Topic.objects.using(self.db)
+            .filter(owner=self.user)
+            .values_list("text", "id")
+        )
+        self.imported = self.skipped = 0
+        self.started = time.monotonic()
+
+        if path == "-":
+            self.import_records(self.read(sys.stdin, file_format))
+        else:
+            with open(path, newline="", encoding="utf-8") as stream:
+                self.import_records(self.read(stream, file_format))
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {self.imported} entries, skipped {self.skipped} "
+                f"in {elapsed:.1f}s ({self.imported / max(elapsed, 1e-6):.0f}/s)."
+            )
+        )
+
+    def read(self, stream, file_format):
+        if file_format == "csv":
+            for line_number, record in enumerate(csv.DictReader(stream), start=2):
+                if record.get("id") == "" and not record.get("text"):
+                    record["text"] = None
+                yield line_number, record
+            return
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                raise CommandError(f"Line {line_number}: invalid JSON ({error}).")
+            yield line_number, record
+
+    def import_records(self, records):
+        batch = []
+        for line_number, record in records:
+            if not isinstance(record, dict):
+                self.stderr.write(f"Line {line_number} skipped: not a JSON object.")
+                self.skipped += 1
+                continue
+            topic_form = TopicForm(data={"text": record.get("topic", "")})
+            entry_form = None
+            if record.get("text", "") is not None:
+                entry_form = EntryForm(data={"text": record.get("text", "")})
+            errors = {**topic_form.errors, **(entry_form.errors if entry_form else {})}
+            if errors:
+                self.stderr.write(f"Line {line_number} skipped: {errors}")
+                self.skipped += 1
+                continue
+            entry = None
+            if entry_form is not None:
+                entry = entry_form.save(commit=False)
+                entry.owner = self.user
+            batch.append((topic_form.cleaned_data["text"], entry))
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        self.flush(batch)
+
+    def flush(self, batch):
+        if not batch:
+            return
+        with transaction.atomic(using=self.db):
+            for topic_text, entry in batch:
+                if topic_text not in self.topics:
+                    topic = Topic.objects.using(self.db).create(
+                        text=topic_text, owner=self.user
+                    )
+                    self.topics[topic_text] = topic.id
+                if entry is not None:
+                    entry.topic_id = self.topics[topic_text]
+            entries = [entry for _, entry in batch if entry is not None]
+            insert_entries(entries, using=self.db)
+        self.imported += len(entries)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f"{self.imported} entries imported "
+            f"({self.imported / max(elapsed, 1e-6):.0f}/s)"
+        )
@@ -0,0 +1,127 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+
+from my_notes import sharding
+from my_notes.bulk import insert_entries
+from my_notes.models import Entry, Topic
+from users.models import ShardAssignment
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a user's topics and entries to another shard in batches. The rows "
+        "get new ids on the target shard. Run it while the user is not writing. "
+        "Shard assignments are only cached in a cache shared by all processes "
+        "(CACHE_BACKEND other than locmem), which the command clears."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("user", help="Username of the owner to move.")
+        parser.add_argument("target", help="Alias of the destination shard.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+        source, target = sharding.shard_for(user.pk), options["target"]
+        if target not in settings.MY_NOTES_SHARDS:
+            raise CommandError(f"{target!r} is not one of {settings.MY_NOTES_SHARDS}.")
+        if target == source:
+            raise CommandError(f"{user} is already on {target}.")
+        self.batch_size = options["batch_size"]
+        started = time.monotonic()
+
+        # Copy, then switch the owner over, then delete the originals, so the
+        # notes stay readable from one of the shards throughout.
+        topics = list(Topic.objects.using(source).filter(owner=user).order_by("id"))
+        copied = 0
+        for start in range(0, len(topics), self.batch_size):
+            copied += self.copy_topics(
+                topics[start : start + self.batch_size], source, target
+            )
+
+        ShardAssignment.objects.update_or_create(
+            owner=user, defaults={"database": target}
+        )
+        cache.delete(sharding.assignment_key(user.pk))
+
+        topic_ids = [topic.id for topic in topics]
+        for start in range(0, len(topic_ids), self.batch_size):
+            with transaction.atomic(using=source):
+                Topic.objects.using(source).filter(
+                    id__in=topic_ids[start : start + self.batch_size]
+                ).delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Moved {len(topics)} topics and {copied} entries of {user} from "
+                f"{source} to {target} in {time.monotonic() - started:.1f}s."
+            )
+        )
+
+    def copy_topics(self, topics, source, target):
+        with transaction.atomic(using=target):
+            new_ids = {}
+            for topic in topics:
+                copy = Topic(text=topic.text, owner_id=topic.owner_id)
+                copy.save(using=target)
+                new_ids[topic.id] = copy.id
+            self.keep_dates(Topic, target, new_ids.values(), topics)
+
+            copied = 0
+            entries = (
+                Entry.objects.using(source)
+                .filter(topic_id__in=list(new_ids))
+                .order_by("id")
+                .iterator(chunk_size=self.batch_size)
+            )
+            batch = []
+            for entry in entries:
+                batch.append(entry)
+                if len(batch) >= self.batch_size:
+                    copied += self.copy_entries(batch, new_ids, target)
+                    batch = []
+            copied += self.copy_entries(batch, new_ids, target)
+
+            # insert_entries counted the copies but dated them now.
+            for topic in topics:
+                Topic.objects.using(target).filter(pk=new_ids[topic.id]).update(
+                    entry_count=topic.entry_count, last_entry_at=topic.last_entry_at
+                )
+        return copied
+
+    def copy_entries(self, entries, new_ids, target):
+        if not entries:
+            return 0
+        copies = [
+            Entry(
+                topic_id=new_ids[entry.topic_id],
+                owner_id=entry.owner_id,
+                text=entry.text,
+                client_key=entry.client_key,
+            )
+            for entry in entries
+        ]
+        copy_ids = sorted(insert_entries(copies, using=target))
+        self.keep_dates(Entry, target, copy_ids, entries)
+        return len(copies)
+
+    def keep_dates(self, model, target, copy_ids, originals):
+        """Give the copies the date_added that auto_now_add replaced."""
+        model.objects.using(target).filter(id__in=list(copy_ids)).update(
+            date_added=Case(
+                *(
+                    When(id=copy_id, then=Value(original.date_added))
+                    for copy_id, original in zip(copy_ids, originals)
+                ),
+                output_field=DateTimeField(),
+            )
+        )
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from my_notes import sync
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the tombstones of the changes feed that are older than --days. "
+        "Clients with an older sync token get a full sync instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.MY_NOTES_TOMBSTONE_DAYS
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to prune, e.g. one shard of MY_NOTES_SHARDS.",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+        deleted = sync.prune_tombstones(options["database"], before)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} tombstones."))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Max
+
+from my_notes.models import Entry, Topic
+
+
+class Command(BaseCommand):
+    help = "Recompute Topic.entry_count and Topic.last_entry_at from the entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to repair, e.g. one shard of MY_NOTES_SHARDS.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size, db = options["batch_size"], options["database"]
+        last_id, fixed, checked = 0, 0, 0
+        while True:
+            with transaction.atomic(using=db):
+                topics = list(
+                    Topic.objects.using(db)
+                    .select_for_update()
+                    .filter(id__gt=last_id)
+                    .only("id", "entry_count", "last_entry_at")
+                    .order_by("id")[:batch_size]
+                )
+                if not topics:
+                    break
+                stats = {
+                    row["topic"]: row
+                    for row in Entry.objects.using(db)
+                    .filter(topic__in=topics)
+                    .values("topic")
+                    .annotate(count=Count("id"), last=Max("date_added"))
+                }
+                drifted = []
+                for topic in topics:
+                    row = stats.get(topic.id, {"count": 0, "last": None})
+                    if (topic.entry_count, topic.last_entry_at) != (
+                        row["count"],
+                        row["last"],
+                    ):
+                        topic.entry_count = row["count"]
+                        topic.last_entry_at = row["last"]
+                        drifted.append(topic)
+                Topic.objects.using(db).bulk_update(
+                    drifted, ["entry_count", "last_entry_at"]
+                )
+            last_id = topics[-1].id
+            checked += len(topics)
+            fixed += len(drifted)
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {checked} topics, repaired {fixed}.")
+        )
@@ -0,0 +1,87 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+
+from my_notes import sync
+from my_notes.bulk import insert_entries
+from my_notes.models import Entry, Topic
+
+WORDS = (
+    "django query index cache template render request response session model "
+    "migration router shard replica stream cursor page topic entry learn note "
+    "python sqlite postgres worker thread async event loop latency throughput"
+).split()
+
+PASSWORD = "benchmark-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users x topics x entries of synthetic notes with bulk_create. "
+        f'Users are named <prefix><n> and share the password "{PASSWORD}".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--topics", type=int, default=10, help="Per user.")
+        parser.add_argument("--entries", type=int, default=100, help="Per topic.")
+        parser.add_argument("--words", type=int, default=80, help="Per entry.")
+        parser.add_argument("--prefix", default="bench")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'Users starting with "{prefix}" already exist.')
+        rng = random.Random(options["seed"])
+        started = time.monotonic()
+
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            User(username=f"{prefix}{number}", password=password)
+            for number in range(options["users"])
+        )
+        users = User.objects.filter(username__startswith=prefix).order_by("id")
+        for user in users:
+            db = router.db_for_write(Topic, instance=user)
+            with transaction.atomic(using=db):
+                # bulk_create() skips the pre_save signal that stamps the
+                # change sequence, see my_notes.signals.
+                last_seq = sync.next_seq(db, options["topics"])
+                Topic.objects.using(db).bulk_create(
+                    Topic(
+                        text=f"{rng.choice(WORDS).title()} #{number}",
+                        owner=user,
+                        seq=last_seq - options["topics"] + 1 + number,
+                    )
+                    for number in range(options["topics"])
+                )
+                batch = []
+                topic_ids = (
+                    Topic.objects.using(db)
+                    .filter(owner=user)
+                    .values_list("id", flat=True)
+                )
+                for topic_id in topic_ids:
+                    for _ in range(options["entries"]):
+                        text = " ".join(rng.choices(WORDS, k=options["words"]))
+                        batch.append(Entry(topic_id=topic_id, owner=user, text=text))
+                        if len(batch) >= options["batch_size"]:
+                            insert_entries(batch, using=db)
+                            batch = []
+                insert_entries(batch, using=db)
+
+        total = options["users"] * options["topics"] * options["entries"]
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {options['users']} users, "
+                f"{options['users'] * options['topics']} topics and {total} "
+                f"entries in {elapsed:.1f}s ({total / max(elapsed, 1e-6):.0f}/s)."
+            )
+        )
@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the default SQLite database over every read replica listed in "
+        "DATABASE_REPLICAS, using SQLite's online backup."
+    )
+
+    def handle(self, *args, **options):
+        if not settings.MY_NOTES_REPLICAS:
+            raise CommandError("No replicas configured; set DATABASE_REPLICAS.")
+        source = connections["default"]
+        if source.vendor != "sqlite":
+            raise CommandError("sync_replicas only copies SQLite databases.")
+        source.ensure_connection()
+        for alias in settings.MY_NOTES_REPLICAS:
+            # Drop open handles so readers reopen the fresh copy.
+            connections[alias].close()
+            target = sqlite3.connect(connections[alias].settings_dict["NAME"])
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f"Copied default to {alias}.")
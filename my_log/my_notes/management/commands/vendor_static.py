@@ -0,0 +1,38 @@
+import base64
+import hashlib
+import os
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from my_notes.vendor import BOOTSTRAP_FILES, BOOTSTRAP_URL
+
+
+def integrity(content):
+    return "sha384-" + base64.b64encode(hashlib.sha384(content).digest()).decode()
+
+
+class Command(BaseCommand):
+    help = (
+        "Download Bootstrap 3.4.1 into config/static/vendor so that the pages "
+        "don't load anything from a CDN. Files already present are kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Download again.")
+
+    def handle(self, *args, **options):
+        root = os.path.join(settings.STATICFILES_DIRS[0], "vendor", "bootstrap")
+        for name, expected in BOOTSTRAP_FILES.items():
+            path = os.path.join(root, name)
+            if os.path.exists(path) and not options["force"]:
+                continue
+            with urlopen(BOOTSTRAP_URL + name, timeout=30) as response:
+                content = response.read()
+            if expected and integrity(content) != expected:
+                raise CommandError(f"{name} does not match {expected}.")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(content)
+            self.stdout.write(f"Downloaded {name}.")
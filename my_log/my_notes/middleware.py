@@ -0,0 +1,468 @@
+import asyncio
+import contextvars
+import hashlib
+import logging
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import compression, sharding
+from .routers import replica_reads
+
+logger = logging.getLogger("my_notes.server_timing")
+
+
+class AsyncCapableMiddleware:
+    """Base for middleware that runs natively under both WSGI and ASGI.
+
+    Under ASGI Django calls sync-only middleware through the one thread that
+    also runs the sync views, which serializes every request. Subclasses
+    implement ``call_sync`` and ``call_async``; Django picks the mode from the
+    handler below.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Django checks for a coroutine function; this is how
+            # django.utils.deprecation.MiddlewareMixin passes for one.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.call_async(request)
+        return self.call_sync(request)
+
+
+class StaticFilesMiddleware(AsyncCapableMiddleware, WhiteNoiseMiddleware):
+    """whitenoise's middleware, without the thread hop under ASGI.
+
+    Finding a file is a dictionary lookup (a stat with autorefresh in
+    development), so it is done in the event loop.
+    """
+
+    def __init__(self, get_response):
+        WhiteNoiseMiddleware.__init__(self, get_response)
+        AsyncCapableMiddleware.__init__(self, get_response)
+
+    def call_sync(self, request):
+        return WhiteNoiseMiddleware.__call__(self, request)
+
+    async def call_async(self, request):
+        response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.seconds += time.perf_counter() - started
+                self.count += 1
+
+
+query_timer = contextvars.ContextVar("query_timer", default=None)
+
+
+@contextmanager
+def time_queries():
+    """Count the queries run in this thread for the request's Server-Timing.
+
+    ServerTimingMiddleware times the thread it runs in; my_notes.async_views
+    calls this in its pool threads.
+    """
+    timer = query_timer.get()
+    with ExitStack() as stack:
+        if timer is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+        yield
+
+
+class ServerTimingMiddleware(AsyncCapableMiddleware):
+    """Report where a request spent its time in a Server-Timing header.
+
+    Measures the session and user lookup, database queries, the view and the
+    rendering of TemplateResponses, and logs the same numbers. Enabled with
+    MY_NOTES_SERVER_TIMING; when it is off Django drops the middleware at
+    startup. Queries are counted in the calling thread and in the pool
+    threads of the async views, but not in the thread Django runs sync views
+    in under ASGI, nor after a streaming response is returned. When none were
+    counted the db metric is left out rather than reported as zero.
+    """
+
+    def __init__(self, get_response):
+        if not settings.MY_NOTES_SERVER_TIMING:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    @contextmanager
+    def timed(self, request):
+        request._server_timing = {}
+        queries = _QueryTimer()
+        token = query_timer.set(queries)
+        started = time.perf_counter()
+        try:
+            with time_queries():
+                yield queries
+        finally:
+            query_timer.reset(token)
+        request._server_timing["total"] = time.perf_counter() - started
+
+    def call_sync(self, request):
+        with self.timed(request) as queries:
+            response = self.get_response(request)
+        return self.report(request, response, queries)
+
+    async def call_async(self, request):
+        with self.timed(request) as queries:
+            response = await self.get_response(request)
+        return self.report(request, response, queries)
+
+    def report(self, request, response, queries):
+        timings = request._server_timing
+        if "view_started" in timings:
+            timings["view"] = time.perf_counter() - timings.pop("view_started")
+        if queries.count:
+            timings["db"] = queries.seconds
+
+        metrics = [
+            ("auth", timings.get("auth"), None),
+            ("db", timings.get("db"), f"{queries.count} queries"),
+            ("view", timings.get("view"), None),
+            ("render", timings.get("render"), None),
+            ("total", timings["total"], None),
+        ]
+        header = []
+        for name, seconds, description in metrics:
+            if seconds is None:
+                continue
+            value = f"{name};dur={seconds * 1000:.1f}"
+            if description:
+                value += f';desc="{description}"'
+            header.append(value)
+        response["Server-Timing"] = ", ".join(header)
+
+        logger.info(
+            "%s %s %s queries=%d %s",
+            request.method,
+            request.path,
+            response.status_code,
+            queries.count,
+            " ".join(
+                f"{name}_ms={seconds * 1000:.1f}"
+                for name, seconds, _ in metrics
+                if seconds is not None
+            ),
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "queries": queries.count,
+                "timings_ms": {
+                    name: round(seconds * 1000, 3)
+                    for name, seconds, _ in metrics
+                    if seconds is not None
+                },
+            },
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # The session and the user are loaded lazily; load them here so that
+        # their cost is reported apart from the view's.
+        started = time.perf_counter()
+        user = getattr(request, "user", None)
+        if user is not None:
+            user.is_authenticated
+        request._server_timing["auth"] = time.perf_counter() - started
+        request._server_timing["view_started"] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timings = request._server_timing
+        timings["view"] = time.perf_counter() - timings.pop("view_started")
+        render_started = time.perf_counter()
+
+        def rendered(response):
+            timings["render"] = time.perf_counter() - render_started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaMiddleware(AsyncCapableMiddleware):
+    """Serve views marked ``read_from_replica`` from the read replicas.
+
+    After a successful write the visitor gets a short-lived cookie and reads
+    from the default database until it expires, so they see their own change.
+    """
+
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        if not settings.MY_NOTES_REPLICAS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call_sync(self, request):
+        token = replica_reads.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.stick(request, response)
+
+    async def call_async(self, request):
+        token = replica_reads.set(False)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.stick(request, response)
+
+    def stick(self, request, response):
+        if request.method not in self.safe_methods and response.status_code < 400:
+            response.set_cookie(
+                settings.MY_NOTES_REPLICA_STICKY_COOKIE,
+                "1",
+                max_age=settings.MY_NOTES_REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        if (
+            getattr(view_class, "read_from_replica", False)
+            and request.method in self.safe_methods
+            and settings.MY_NOTES_REPLICA_STICKY_COOKIE not in request.COOKIES
+        ):
+            replica_reads.set(True)
+
+
+class ShardMiddleware(AsyncCapableMiddleware):
+    """Route the request's my_notes queries to the signed-in user's shard."""
+
+    def __init__(self, get_response):
+        if not sharding.is_enabled():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call_sync(self, request):
+        # request.user is lazy; the router only resolves it for a query.
+        with sharding.owner_scope(request.user):
+            return self.get_response(request)
+
+    async def call_async(self, request):
+        with sharding.owner_scope(request.user):
+            return await self.get_response(request)
+
+
+class AnonymousPageCacheMiddleware(AsyncCapableMiddleware):
+    """Serve anonymous GETs of MY_NOTES_ANONYMOUS_CACHE_VIEWS from the cache.
+
+    Only requests without a session cookie are cached, and the page is
+    stored with its CSRF tokens blanked out; every visitor gets their own
+    token (and CSRF cookie) filled in. Nothing past this middleware runs for
+    a cached page, so it doesn't touch the database.
+    """
+
+    csrf_input = re.compile(rb'(name="csrfmiddlewaretoken" value=")[A-Za-z0-9]+(")')
+    csrf_placeholder = b"CSRF_TOKEN_PLACEHOLDER"
+
+    def __init__(self, get_response):
+        if not settings.MY_NOTES_ANONYMOUS_CACHE_TIMEOUT:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def cache_key(self, request):
+        if request.method != "GET" or settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if match.view_name not in settings.MY_NOTES_ANONYMOUS_CACHE_VIEWS:
+            return None
+        # Arbitrary parameters would each get a copy of the page.
+        if not set(request.GET) <= set(settings.MY_NOTES_ANONYMOUS_CACHE_PARAMS):
+            return None
+        query = urlencode(sorted(request.GET.lists()), doseq=True)
+        digest = hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+        return f"my_notes:page:{digest}"
+
+    def call_sync(self, request):
+        key = self.cache_key(request)
+        if key is None:
+            return self.get_response(request)
+        cached = cache.get(key)
+        if cached is not None:
+            return self.cached_response(request, *cached)
+        response = self.get_response(request)
+        page = self.cacheable_page(response)
+        if page is not None:
+            cache.set(key, page, settings.MY_NOTES_ANONYMOUS_CACHE_TIMEOUT)
+        return response
+
+    async def call_async(self, request):
+        key = self.cache_key(request)
+        if key is None:
+            return await self.get_response(request)
+        # The cache client may block on the network; keep it off the loop.
+        cached = await sync_to_async(cache.get, thread_sensitive=False)(key)
+        if cached is not None:
+            return self.cached_response(request, *cached)
+        response = await self.get_response(request)
+        page = self.cacheable_page(response)
+        if page is not None:
+            await sync_to_async(cache.set, thread_sensitive=False)(
+                key, page, settings.MY_NOTES_ANONYMOUS_CACHE_TIMEOUT
+            )
+        return response
+
+    def cacheable_page(self, response):
+        if (
+            response.status_code != 200
+            or response.streaming
+            or response.cookies.get(settings.SESSION_COOKIE_NAME)
+        ):
+            return None
+        headers = {
+            name: value
+            for name, value in response.items()
+            if name.lower() != "content-length"
+        }
+        content = self.csrf_input.sub(
+            rb"\1" + self.csrf_placeholder + rb"\2", response.content
+        )
+        return headers, content
+
+    def cached_response(self, request, headers, content):
+        if self.csrf_placeholder in content:
+            content = content.replace(
+                self.csrf_placeholder, get_token(request).encode()
+            )
+        response = HttpResponse(content)
+        for name, value in headers.items():
+            response[name] = value
+        patch_vary_headers(response, ("Cookie",))
+        return response
+
+
+class CompressionMiddleware(AsyncCapableMiddleware):
+    """Compress responses with brotli or gzip, whichever the client accepts.
+
+    Streaming responses are compressed as they are produced and flushed every
+    stream_flush_size bytes, so they are never held in memory. Pages that carry a CSRF token are only gzipped,
+    with random padding in the gzip header against BREACH. Small responses,
+    binary formats and responses that already have a Content-Encoding (like
+    whitenoise's pre-compressed static files) are left alone.
+    """
+
+    min_length = 200
+    max_random_bytes = 100
+    stream_flush_size = 32 * 1024
+    compressible_types = (
+        "text/",
+        "application/javascript",
+        "application/json",
+        "application/x-ndjson",
+        "application/xml",
+        "image/svg+xml",
+    )
+
+    def __init__(self, get_response):
+        if not settings.MY_NOTES_COMPRESSION:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call_sync(self, request):
+        return self.compress(request, self.get_response(request))
+
+    async def call_async(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if (
+            response.has_header("Content-Encoding")
+            or not response.get("Content-Type", "").startswith(self.compressible_types)
+            or (not response.streaming and len(response.content) < self.min_length)
+        ):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        breach_prone = request.META.get("CSRF_COOKIE_USED", False)
+        encoding = compression.negotiate(
+            request.META.get("HTTP_ACCEPT_ENCODING", ""),
+            ("gzip",) if breach_prone else compression.available(),
+        )
+        if encoding == "br":
+            encoder = compression.BrotliEncoder()
+        elif encoding == "gzip":
+            encoder = compression.GzipEncoder(
+                padding=self.max_random_bytes if breach_prone else 0
+            )
+        else:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self.compress_stream(
+                encoder, response.streaming_content
+            )
+            del response["Content-Length"]
+        else:
+            content = encoder.compress(response.content, flush=False)
+            content += encoder.finish()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response["Content-Length"] = str(len(content))
+
+        # The body differs from the one the ETag was computed for.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
+
+    def compress_stream(self, encoder, chunks):
+        # Every flush costs compression, so flush after enough input to be
+        # worth sending rather than after every chunk, e.g. every export row.
+        pending = 0
+        for chunk in chunks:
+            pending += len(chunk)
+            flush = pending >= self.stream_flush_size
+            if flush:
+                pending = 0
+            data = encoder.compress(chunk, flush=flush)
+            if data:
+                yield data
+        yield encoder.finish()
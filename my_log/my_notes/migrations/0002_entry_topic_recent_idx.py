@@ -0,0 +1,19 @@
+# Generated by Django 3.2.9 on 2026-10-18 14:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_notes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="entry",
+            index=models.Index(
+                fields=["topic", "-date_added", "-id"], name="entry_topic_recent_idx"
+            ),
+        ),
+    ]
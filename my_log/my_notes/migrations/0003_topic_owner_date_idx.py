@@ -0,0 +1,19 @@
+# Generated by Django 3.2.9 on 2026-10-18 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_notes", "0002_entry_topic_recent_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="topic",
+            index=models.Index(
+                fields=["owner", "date_added"], name="topic_owner_date_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.9 on 2026-10-18 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_notes", "0004_entry_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="entry",
+            name="html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="entry",
+            name="preview",
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.9 on 2026-10-18 14:39
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_topic_counters(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Entry = apps.get_model("my_notes", "Entry")
+    Topic = apps.get_model("my_notes", "Topic")
+    entries = Entry.objects.using(db).filter(topic=OuterRef("pk")).values("topic")
+    Topic.objects.using(db).update(
+        entry_count=Coalesce(
+            Subquery(entries.annotate(count=Count("id")).values("count")), 0
+        ),
+        last_entry_at=Subquery(entries.annotate(last=Max("date_added")).values("last")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_notes", "0005_entry_html_preview"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="topic",
+            name="entry_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="topic",
+            name="last_entry_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_topic_counters, migrations.RunPython.noop),
+    ]
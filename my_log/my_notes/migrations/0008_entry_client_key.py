@@ -0,0 +1,24 @@
+# Generated by Django 3.2.9 on 2026-10-18 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_notes", "0007_owner_without_db_constraint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="entry",
+            name="client_key",
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="entry",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "client_key"), name="entry_owner_client_key_uniq"
+            ),
+        ),
+    ]
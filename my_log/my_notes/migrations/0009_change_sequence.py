@@ -0,0 +1,118 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_existing_rows(apps, schema_editor):
+    """Give every existing topic and entry its own sequence number."""
+    db = schema_editor.connection.alias
+    ChangeCounter = apps.get_model("my_notes", "ChangeCounter")
+    Entry = apps.get_model("my_notes", "Entry")
+    Topic = apps.get_model("my_notes", "Topic")
+    last_topic = Topic.objects.using(db).aggregate(last=Max("id"))["last"] or 0
+    last_entry = Entry.objects.using(db).aggregate(last=Max("id"))["last"] or 0
+    Topic.objects.using(db).update(seq=F("id"), updated_at=F("date_added"))
+    Entry.objects.using(db).update(seq=F("id") + last_topic, updated_at=F("date_added"))
+    ChangeCounter.objects.using(db).create(id=1, value=last_topic + last_entry)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("my_notes", "0008_entry_client_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="topic",
+            name="seq",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="topic",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="entry",
+            name="seq",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="entry",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(number_existing_rows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="topic",
+            index=models.Index(fields=["owner", "seq"], name="topic_owner_seq_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="entry",
+            index=models.Index(fields=["owner", "seq"], name="entry_owner_seq_idx"),
+        ),
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("topic", "topic"), ("entry", "entry")],
+                        max_length=5,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("seq", models.BigIntegerField()),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["owner", "seq"], name="tombstone_owner_seq_idx"
+                    )
+                ],
+            },
+        ),
+    ]
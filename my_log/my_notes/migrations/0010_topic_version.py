@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_notes", "0009_change_sequence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="topic",
+            name="version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_notes", "0010_topic_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="changecounter",
+            name="pruned",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
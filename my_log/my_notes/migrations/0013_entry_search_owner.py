@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from my_notes import search
+
+
+def rebuild_sqlite_index(apps, schema_editor):
+    # The FTS5 table gains the owner column; PostgreSQL's table is unchanged.
+    if schema_editor.connection.vendor == "sqlite":
+        search.drop_index(schema_editor.connection)
+        search.create_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_notes", "0012_owner_do_nothing"),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_sqlite_index, migrations.RunPython.noop),
+    ]
@@ -1,26 +1,147 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.html import linebreaks
 
 # Create your models here.
 
 
+class TopicQuerySet(models.QuerySet):
+    def for_user(self, user):
+        return self.filter(owner=user)
+
+    # Counter updates are single UPDATE statements built from F() expressions,
+    # so concurrent writers never overwrite each other's increments.
+
+    def entries_added(self, count, latest):
+        return self.update(
+            entry_count=F("entry_count") + count,
+            last_entry_at=Greatest(Coalesce("last_entry_at", Value(latest)), latest),
+            version=F("version") + 1,
+            updated_at=timezone.now(),
+        )
+
+    def entry_changed(self, date_added):
+        return self.entries_added(0, date_added)
+
+    def entry_removed(self):
+        newest = Entry.objects.filter(topic=OuterRef("pk")).order_by("-date_added")
+        return self.update(
+            entry_count=F("entry_count") - 1,
+            last_entry_at=Subquery(newest.values("date_added")[:1]),
+            version=F("version") + 1,
+            updated_at=timezone.now(),
+        )
+
+
 class Topic(models.Model):
     text = models.CharField(max_length=200)
     date_added = models.DateTimeField(auto_now_add=True)
-    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Users stay in the default database when notes are sharded by owner, so
+    # neither the database nor the ORM can follow the key; deleting a user
+    # deletes their notes in my_notes.signals.
+    owner = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False)
+    entry_count = models.PositiveIntegerField(default=0, editable=False)
+    last_entry_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Bumped by every write to the topic's entries; keys the topic page caches.
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # Position in the database's change sequence, see my_notes.sync.
+    seq = models.BigIntegerField(default=0, editable=False)
+    # Moved by writes to the topic's entries too, see TopicQuerySet.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TopicQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "date_added"], name="topic_owner_date_idx"),
+            models.Index(fields=["owner", "seq"], name="topic_owner_seq_idx"),
+        ]
 
     def __str__(self):
         return self.text
 
 
+class EntryQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """The user's entries, each loaded together with its topic."""
+        return self.filter(owner=user).select_related("topic")
+
+
 class Entry(models.Model):
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name="topic")
     text = models.TextField()
+    html = models.TextField(blank=True, editable=False)
+    preview = models.CharField(max_length=200, blank=True, editable=False)
     date_added = models.DateTimeField(auto_now_add=True)
-    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Users stay in the default database when notes are sharded by owner.
+    owner = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False)
+    # Chosen by offline clients so that retried batch uploads aren't duplicated.
+    client_key = models.CharField(max_length=64, null=True, editable=False)
+    seq = models.BigIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EntryQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "entries"
+        indexes = [
+            models.Index(
+                fields=["topic", "-date_added", "-id"], name="entry_topic_recent_idx"
+            ),
+            models.Index(fields=["owner", "seq"], name="entry_owner_seq_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "client_key"], name="entry_owner_client_key_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return (self.preview or self.text)[:50] + "..."
+
+    def render_text(self):
+        """Fill the columns derived from text; bulk_create skips save()."""
+        self.html = linebreaks(self.text, autoescape=True)
+        self.preview = self.text[: self._meta.get_field("preview").max_length]
+
+    def save(self, *args, **kwargs):
+        if "text" not in self.get_deferred_fields():
+            self.render_text()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            derived = {"seq", "updated_at"}
+            if "text" in update_fields:
+                derived |= {"html", "preview"}
+            kwargs["update_fields"] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+
+
+class ChangeCounter(models.Model):
+    """The single row holding the last change sequence number handed out."""
+
+    value = models.BigIntegerField(default=0)
+    # The newest pruned tombstone; tokens from before it have to start over.
+    pruned = models.BigIntegerField(default=0)
+
+
+class Tombstone(models.Model):
+    """Left behind by a deleted topic or entry for the changes feed."""
+
+    KINDS = [("topic", "topic"), ("entry", "entry")]
+
+    kind = models.CharField(max_length=5, choices=KINDS)
+    object_id = models.BigIntegerField()
+    owner = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False)
+    seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "seq"], name="tombstone_owner_seq_idx"),
+        ]
 
     def __str__(self):
-        return self.text[:50] + "..."
+        return f"deleted {self.kind} {self.object_id}"
@@ -0,0 +1,152 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(value, pk):
+    raw = f"{value.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        value, pk = raw.rsplit("|", 1)
+        value, pk = parse_datetime(value), int(pk)
+    except (ValueError, binascii.Error, UnicodeError):
+        raise InvalidCursor(cursor)
+    if value is None:
+        raise InvalidCursor(cursor)
+    return value, pk
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class KeysetPaginator:
+    """Paginates a queryset on (field, pk) without OFFSET.
+
+    Every page is a single range scan that starts right after the cursor row,
+    so the cost stays the same no matter how deep the client has paged.
+    """
+
+    def __init__(self, queryset, per_page, field="date_added", descending=True):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+        self.descending = descending
+
+    def _ordering(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = "-" if descending else ""
+        return (prefix + self.field, prefix + "pk")
+
+    def _seek(self, cursor, reverse=False):
+        value, pk = decode_cursor(cursor)
+        lookup = "lt" if self.descending != reverse else "gt"
+        return self.queryset.filter(
+            Q(**{f"{self.field}__{lookup}": value})
+            | Q(**{self.field: value, f"pk__{lookup}": pk})
+        ).order_by(*self._ordering(reverse))
+
+    def _cursor_for(self, obj):
+        if isinstance(obj, dict):
+            return encode_cursor(obj[self.field], obj["id"])
+        return encode_cursor(getattr(obj, self.field), obj.pk)
+
+    def page(self, after=None, before=None):
+        """Return the page following ``after`` or preceding ``before``.
+
+        Raise InvalidCursor if the given cursor can't be decoded.
+        """
+        if before:
+            rows = list(self._seek(before, reverse=True)[: self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[: self.per_page][::-1]
+            has_next = bool(rows)
+        else:
+            if after:
+                queryset = self._seek(after)
+            else:
+                queryset = self.queryset.order_by(*self._ordering())
+            rows = list(queryset[: self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[: self.per_page]
+            has_previous = bool(after) and bool(rows)
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor_for(rows[-1]) if has_next else None,
+            previous_cursor=self._cursor_for(rows[0]) if has_previous else None,
+        )
+
+
+class MergedKeysetPaginator(KeysetPaginator):
+    """Paginates several querysets, e.g. one per shard, as if they were one.
+
+    Each page reads one keyset page from every queryset and keeps the first
+    per_page rows of their merge, so cursors work the same as for a single
+    queryset.
+    """
+
+    def __init__(self, querysets, per_page, field="date_added", descending=True):
+        super().__init__(None, per_page, field, descending)
+        self.paginators = [
+            KeysetPaginator(queryset, per_page, field, descending)
+            for queryset in querysets
+        ]
+
+    def _key(self, obj):
+        if isinstance(obj, dict):
+            return obj[self.field], obj["id"]
+        return getattr(obj, self.field), obj.pk
+
+    def page(self, after=None, before=None):
+        pages = [paginator.page(after, before) for paginator in self.paginators]
+        rows = sorted(
+            (row for page in pages for row in page),
+            key=self._key,
+            reverse=self.descending,
+        )
+        if before:
+            has_previous = len(rows) > self.per_page or any(
+                page.has_previous() for page in pages
+            )
+            rows = rows[-self.per_page :]
+            has_next = bool(rows)
+        else:
+            has_next = len(rows) > self.per_page or any(
+                page.has_next() for page in pages
+            )
+            rows = rows[: self.per_page]
+            has_previous = bool(after) and bool(rows)
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor_for(rows[-1]) if has_next else None,
+            previous_cursor=self._cursor_for(rows[0]) if has_previous else None,
+        )
@@ -0,0 +1,96 @@
+"""Database routers for my_notes.
+
+ShardRouter sends Topic and Entry queries to their owner's shard (see
+my_notes.sharding) when MY_NOTES_SHARDS is set. Otherwise ReplicaRouter sends
+reads of the listing views to read replicas of the default database:
+ReplicaMiddleware turns replica reads on for views marked with
+``read_from_replica = True``, unless the visitor wrote something in the last
+MY_NOTES_REPLICA_STICKY_SECONDS and may not see it on a lagging replica yet.
+Writes, and every other read, go to the default database.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from . import sharding
+
+ROUTED_APPS = {"my_notes"}
+
+replica_reads = contextvars.ContextVar("replica_reads", default=False)
+
+
+@contextmanager
+def reading_from_replicas(enabled=True):
+    token = replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ShardRouter:
+    def _shard(self, model, hints):
+        if not sharding.is_enabled() or model._meta.app_label not in ROUTED_APPS:
+            return None
+        instance = hints.get("instance")
+        if isinstance(instance, get_user_model()):
+            return sharding.shard_for(instance.pk)
+        if instance is not None:
+            # Related lookups stay on the database the instance came from.
+            if instance._state.db in settings.MY_NOTES_SHARDS:
+                return instance._state.db
+            return sharding.shard_for(instance.owner_id)
+        owner = sharding.current_owner.get()
+        owner_id = getattr(owner, "pk", owner)
+        if owner_id is None:
+            return None
+        return sharding.shard_for(owner_id)
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Notes on a shard point at users in the default database.
+        if sharding.is_enabled():
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not sharding.is_enabled():
+            return None
+        if app_label in ROUTED_APPS:
+            return db in settings.MY_NOTES_SHARDS
+        return db == "default"
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APPS:
+            return None
+        if replica_reads.get() and settings.MY_NOTES_REPLICAS:
+            return random.choice(settings.MY_NOTES_REPLICAS)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        # Instances keep the alias they were read from; never write there.
+        if model._meta.app_label not in ROUTED_APPS:
+            return None
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *settings.MY_NOTES_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the default database, see sync_replicas.
+        if db in settings.MY_NOTES_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,190 @@
+"""Full-text search over entries.
+
+SQLite keeps an FTS5 virtual table and PostgreSQL a tsvector column with a GIN
+index, both in ``my_notes_entry_search`` and keyed by entry id. The FTS5 rows
+also hold the owner id, which a search matches first so that it only ranks
+the owner's entries. The index is
+updated row by row from the Entry signals, and for all of a topic's entries
+when the topic is renamed, so a search never scans entries.
+"""
+import re
+
+from django.db import connections
+
+SEARCH_TABLE = "my_notes_entry_search"
+SEARCH_CONFIG = "simple"
+
+SQLITE_SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "text, topic_text, owner, tokenize = 'unicode61 remove_diacritics 2')",
+]
+
+POSTGRESQL_SCHEMA = [
+    f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+    "entry_id bigint PRIMARY KEY REFERENCES my_notes_entry (id) "
+    "ON DELETE CASCADE, "
+    "document tsvector NOT NULL)",
+    f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx "
+    f"ON {SEARCH_TABLE} USING gin (document)",
+]
+
+POSTGRESQL_DOCUMENT = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', %s), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', "
+    "(SELECT text FROM my_notes_topic WHERE id = %s)), 'B')"
+)
+
+
+def is_supported(connection):
+    return connection.vendor in ("sqlite", "postgresql")
+
+
+def create_index(connection):
+    """Create the search table and fill it from the existing entries."""
+    if connection.vendor == "sqlite":
+        statements = SQLITE_SCHEMA + [
+            f"INSERT INTO {SEARCH_TABLE} (rowid, text, topic_text, owner) "
+            "SELECT e.id, e.text, t.text, e.owner_id FROM my_notes_entry e "
+            "JOIN my_notes_topic t ON t.id = e.topic_id",
+        ]
+    elif connection.vendor == "postgresql":
+        statements = POSTGRESQL_SCHEMA + [
+            f"INSERT INTO {SEARCH_TABLE} (entry_id, document) "
+            f"SELECT e.id, setweight(to_tsvector('{SEARCH_CONFIG}', e.text), 'A') "
+            f"|| setweight(to_tsvector('{SEARCH_CONFIG}', t.text), 'B') "
+            "FROM my_notes_entry e JOIN my_notes_topic t ON t.id = e.topic_id",
+        ]
+    else:
+        return
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_index(connection):
+    if is_supported(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+def index_entry(entry, using="default"):
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        sql = [
+            (f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [entry.pk]),
+            (
+                f"INSERT INTO {SEARCH_TABLE} (rowid, text, topic_text, owner) "
+                "VALUES (%s, %s, (SELECT text FROM my_notes_topic WHERE id = %s), %s)",
+                [entry.pk, entry.text, entry.topic_id, entry.owner_id],
+            ),
+        ]
+    elif connection.vendor == "postgresql":
+        sql = [
+            (
+                f"INSERT INTO {SEARCH_TABLE} (entry_id, document) "
+                f"VALUES (%s, {POSTGRESQL_DOCUMENT}) "
+                "ON CONFLICT (entry_id) DO UPDATE SET document = EXCLUDED.document",
+                [entry.pk, entry.text, entry.topic_id],
+            ),
+        ]
+    else:
+        return
+    with connection.cursor() as cursor:
+        for statement, params in sql:
+            cursor.execute(statement, params)
+
+
+def index_entries(entry_ids, using="default"):
+    """Index entries by id with set-based statements, for bulk inserts."""
+    connection = connections[using]
+    if not entry_ids or not is_supported(connection):
+        return
+    placeholders = ", ".join(["%s"] * len(entry_ids))
+    if connection.vendor == "sqlite":
+        sql = [
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})",
+            f"INSERT INTO {SEARCH_TABLE} (rowid, text, topic_text, owner) "
+            "SELECT e.id, e.text, t.text, e.owner_id FROM my_notes_entry e "
+            "JOIN my_notes_topic t ON t.id = e.topic_id "
+            f"WHERE e.id IN ({placeholders})",
+        ]
+    else:
+        sql = [
+            f"INSERT INTO {SEARCH_TABLE} (entry_id, document) "
+            f"SELECT e.id, setweight(to_tsvector('{SEARCH_CONFIG}', e.text), 'A') "
+            f"|| setweight(to_tsvector('{SEARCH_CONFIG}', t.text), 'B') "
+            "FROM my_notes_entry e JOIN my_notes_topic t ON t.id = e.topic_id "
+            f"WHERE e.id IN ({placeholders}) "
+            "ON CONFLICT (entry_id) DO UPDATE SET document = EXCLUDED.document",
+        ]
+    with connection.cursor() as cursor:
+        for statement in sql:
+            cursor.execute(statement, list(entry_ids))
+
+
+def index_topic(topic, using="default"):
+    """Refresh the topic text indexed with each of the topic's entries."""
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        sql = (
+            f"UPDATE {SEARCH_TABLE} SET topic_text = %s "
+            "WHERE rowid IN (SELECT id FROM my_notes_entry WHERE topic_id = %s)"
+        )
+    elif connection.vendor == "postgresql":
+        sql = (
+            f"UPDATE {SEARCH_TABLE} s "
+            f"SET document = setweight(to_tsvector('{SEARCH_CONFIG}', e.text), 'A') "
+            f"|| setweight(to_tsvector('{SEARCH_CONFIG}', %s), 'B') "
+            "FROM my_notes_entry e WHERE e.id = s.entry_id AND e.topic_id = %s"
+        )
+    else:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [topic.text, topic.pk])
+
+
+def remove_entry(entry_id, using="default"):
+    connection = connections[using]
+    # PostgreSQL rows go away with the entry through ON DELETE CASCADE.
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [entry_id])
+
+
+def fts5_query(query):
+    """Turn free text into an FTS5 query matching every word as a prefix.
+
+    The words only match the entry and topic text, not the owner column.
+    """
+    words = re.findall(r"\w+", query)
+    return " ".join(f'{{text topic_text}} : "{word}"*' for word in words)
+
+
+def search_entry_ids(owner_id, query, limit, offset=0, using="default"):
+    """Return ids of the owner's entries matching ``query``, best match first."""
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        query = fts5_query(query)
+        sql = (
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+            f"ORDER BY bm25({SEARCH_TABLE}, 2.0, 1.0, 0.0), rowid DESC "
+            "LIMIT %s OFFSET %s"
+        )
+        params = [f'owner : "{int(owner_id)}" AND {query}', limit, offset]
+    elif connection.vendor == "postgresql":
+        sql = (
+            f"SELECT s.entry_id FROM {SEARCH_TABLE} s "
+            "JOIN my_notes_entry e ON e.id = s.entry_id, "
+            f"plainto_tsquery('{SEARCH_CONFIG}', %s) q "
+            "WHERE s.document @@ q AND e.owner_id = %s "
+            "ORDER BY ts_rank(s.document, q) DESC, s.entry_id DESC "
+            "LIMIT %s OFFSET %s"
+        )
+        params = [query, owner_id, limit, offset]
+    else:
+        return []
+    if not query.strip():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,96 @@
+"""Partition Topic and Entry rows across databases by owner.
+
+Users, sessions and the other central tables stay in the default database.
+An owner's notes live on the shard picked by a consistent hash ring over
+MY_NOTES_SHARDS, unless a users.ShardAssignment row (written when the owner
+is moved with move_user_shard) names another one. Adding a shard only moves
+the owners whose ring segment it takes over.
+
+Ids are allocated per database, so a topic or entry id is only unique
+together with its owner; that is how the views and caches look rows up.
+Listings merged across shards order on (date_added, id), and two rows that
+tie on both, which takes the same microsecond, could straddle a page break
+and one of them be skipped. Deleting a user cascades to the notes on every
+shard, see my_notes.signals.
+"""
+import bisect
+import contextvars
+import hashlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+ASSIGNMENT_TIMEOUT = 60 * 60 * 24
+
+current_owner = contextvars.ContextVar("shard_owner", default=None)
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes, points_per_node=64):
+        self._points = sorted(
+            (_hash(f"{node}#{point}"), node)
+            for node in nodes
+            for point in range(points_per_node)
+        )
+        self._hashes = [point for point, _ in self._points]
+
+    def node_for(self, key):
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._points)
+        return self._points[index][1]
+
+
+_rings = {}
+
+
+def ring():
+    shards = tuple(settings.MY_NOTES_SHARDS)
+    if shards not in _rings:
+        _rings[shards] = HashRing(shards)
+    return _rings[shards]
+
+
+def is_enabled():
+    return bool(settings.MY_NOTES_SHARDS)
+
+
+def databases():
+    """Aliases to query for rows of every owner; [None] lets routers decide."""
+    return list(settings.MY_NOTES_SHARDS) or [None]
+
+
+def assignment_key(owner_id):
+    return f"my_notes:shard:{owner_id}"
+
+
+def shard_for(owner_id):
+    """Return the alias of the database holding the owner's notes."""
+    from users.models import ShardAssignment
+
+    # move_user_shard can only clear a cache that every process shares.
+    key = assignment_key(owner_id)
+    alias = cache.get(key) if settings.SHARED_CACHE else None
+    if alias not in settings.MY_NOTES_SHARDS:
+        alias = (
+            ShardAssignment.objects.using("default")
+            .filter(owner_id=owner_id, database__in=settings.MY_NOTES_SHARDS)
+            .values_list("database", flat=True)
+            .first()
+        ) or ring().node_for(owner_id)
+        if settings.SHARED_CACHE:
+            cache.set(key, alias, ASSIGNMENT_TIMEOUT)
+    return alias
+
+
+@contextmanager
+def owner_scope(owner):
+    """Route unqualified my_notes queries to ``owner``'s shard."""
+    token = current_owner.set(owner)
+    try:
+        yield
+    finally:
+        current_owner.reset(token)
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import search, sqlite, sync
+from .models import Entry, Tombstone, Topic
+
+
+@receiver(pre_save, sender=Topic)
+@receiver(pre_save, sender=Entry)
+def stamp_change(sender, instance, using, raw=False, **kwargs):
+    if not raw:
+        instance.seq = sync.next_seq(using)
+
+
+@receiver(post_save, sender=Entry)
+def entry_saved(sender, instance, created, using, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_entry(instance, using=using)
+    topic = Topic.objects.using(using).filter(pk=instance.topic_id)
+    if created:
+        topic.entries_added(1, instance.date_added)
+    else:
+        topic.entry_changed(instance.date_added)
+
+
+@receiver(post_save, sender=Topic)
+def topic_saved(
+    sender, instance, created, using, raw=False, update_fields=None, **kwargs
+):
+    # Entries are indexed together with the text of their topic.
+    if created or raw or (update_fields is not None and "text" not in update_fields):
+        return
+    search.index_topic(instance, using=using)
+
+
+@receiver(post_delete, sender=Entry)
+def entry_deleted(sender, instance, using, **kwargs):
+    search.remove_entry(instance.pk, using=using)
+    Topic.objects.using(using).filter(pk=instance.topic_id).entry_removed()
+
+
+@receiver(post_delete, sender=Topic)
+@receiver(post_delete, sender=Entry)
+def leave_tombstone(sender, instance, using, **kwargs):
+    Tombstone.objects.using(using).create(
+        kind=sender._meta.model_name,
+        object_id=instance.pk,
+        owner_id=instance.owner_id,
+        seq=sync.next_seq(using),
+    )
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, using, **kwargs):
+    # The owner keys don't cascade, since the notes may be on other databases;
+    # with dedicated shards, the default database has no my_notes tables.
+    for alias in settings.MY_NOTES_SHARDS or [using]:
+        Topic.objects.using(alias).filter(owner_id=instance.pk).delete()
+        # Deleting the notes has left tombstones for them behind.
+        Tombstone.objects.using(alias).filter(owner_id=instance.pk).delete()
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    if connection.vendor == "sqlite":
+        sqlite.apply_pragmas(connection.connection)
@@ -0,0 +1,12 @@
+from django.conf import settings
+
+
+def apply_pragmas(connection, pragmas=None):
+    """Run ``PRAGMA name = value`` on a DB-API SQLite connection."""
+    pragmas = settings.SQLITE_PRAGMAS if pragmas is None else pragmas
+    cursor = connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
@@ -0,0 +1,17 @@
+from django.contrib.staticfiles.storage import StaticFilesStorage
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class VersionedStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Fingerprint static files and store gzip and brotli copies of them.
+
+    collectstatic writes ``name.<hash>.ext`` and its ``.gz``/``.br`` siblings
+    to STATIC_ROOT, which whitenoise serves as immutable for ten years. Until
+    collectstatic has run, as in development and the tests, the files keep
+    their plain names instead of failing to resolve.
+    """
+
+    def url(self, name, force=False):
+        if not self.hashed_files and not force:
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force)
@@ -0,0 +1,117 @@
+"""Change sequence and sync tokens for the changes feed.
+
+Every topic or entry write stamps the row with the next number of its
+database's change sequence, and every delete leaves a Tombstone with one, so
+"what changed since N" is a range scan on the (owner, seq) indexes. Tokens
+name the database too: sequences of different shards aren't comparable.
+Tombstones are pruned after MY_NOTES_TOMBSTONE_DAYS, and tokens from before
+the newest pruned one are answered with a full sync.
+"""
+import base64
+import binascii
+
+from django.db import connections, transaction
+from django.db.models import Max
+from django.db.models.functions import Greatest
+
+from .models import ChangeCounter, Entry, Tombstone, Topic
+
+TOPIC_FIELDS = ("id", "text", "date_added", "updated_at")
+ENTRY_FIELDS = ("id", "topic_id", "text", "date_added", "updated_at", "client_key")
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def _can_return(connection):
+    # UPDATE ... RETURNING arrived in SQLite 3.35; Debian buster ships 3.27.
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return connection.vendor == "postgresql"
+
+
+def next_seq(using, count=1):
+    """Reserve ``count`` sequence numbers and return the last of them.
+
+    Call it in the transaction that writes the rows: the counter row stays
+    locked until it ends, so numbers become visible in the order they were
+    handed out and a client never skips a change that commits late.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(ChangeCounter._meta.db_table)
+    returning = " RETURNING value" if _can_return(connection) else ""
+    update = f"UPDATE {table} SET value = value + %s WHERE id = 1{returning}"
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(update, [count])
+            if returning:
+                row = cursor.fetchone()
+            elif cursor.rowcount:
+                # The UPDATE holds the row, so this reads our own increment.
+                cursor.execute(f"SELECT value FROM {table} WHERE id = 1")
+                row = cursor.fetchone()
+            else:
+                row = None
+            if row is not None:
+                return row[0]
+            # The migration creates the row; a flushed database has lost it.
+            ChangeCounter.objects.using(using).get_or_create(id=1)
+
+
+def pruned_seq(using):
+    """The sequence number that tokens must have reached to be served."""
+    counter = ChangeCounter.objects.using(using).filter(id=1)
+    return counter.values_list("pruned", flat=True).first() or 0
+
+
+def prune_tombstones(using, before):
+    """Delete the tombstones left before ``before``; return how many."""
+    with transaction.atomic(using=using):
+        old = Tombstone.objects.using(using).filter(deleted_at__lt=before)
+        horizon = old.aggregate(last=Max("seq"))["last"]
+        if horizon is None:
+            return 0
+        ChangeCounter.objects.using(using).get_or_create(id=1)
+        ChangeCounter.objects.using(using).filter(id=1).update(
+            pruned=Greatest("pruned", horizon)
+        )
+        tombstones = Tombstone.objects.using(using).filter(seq__lte=horizon)
+        return tombstones.delete()[0]
+
+
+def encode_token(using, seq):
+    return base64.urlsafe_b64encode(f"{using}|{seq}".encode()).decode().rstrip("=")
+
+
+def decode_token(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        using, seq = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return using, int(seq)
+    except (ValueError, binascii.Error, UnicodeError):
+        raise InvalidToken(token)
+
+
+def changes(owner, since, limit, using):
+    """Return the first ``limit`` changes after ``since`` and if more follow.
+
+    Changes are (seq, kind, row) tuples in sequence order, where kind is
+    "topic", "entry" or "deleted". Only the latest state of a row is kept, so
+    a row changed twice since the token is returned once.
+    """
+    sources = {
+        "topic": Topic.objects.values(*TOPIC_FIELDS, "seq"),
+        "entry": Entry.objects.values(*ENTRY_FIELDS, "seq"),
+        "deleted": Tombstone.objects.values("kind", "object_id", "seq"),
+    }
+    found = []
+    for kind, queryset in sources.items():
+        rows = (
+            queryset.using(using)
+            .filter(owner=owner, seq__gt=since)
+            .order_by("seq")[: limit + 1]
+        )
+        found.extend((row.pop("seq"), kind, row) for row in rows)
+    found.sort(key=lambda change: change[0])
+    return found[:limit], len(found) > limit
@@ -0,0 +1,28 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from .. import vendor
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor_asset(name):
+    """Link a vendored file, or its CDN copy until it has been vendored.
+
+    Without the fallback a missing file would break every page: the manifest
+    storage raises for names that collectstatic didn't see.
+    """
+    if vendor.is_vendored(name):
+        url, integrity = static(name), None
+    else:
+        url, integrity = vendor.cdn_fallback(name)
+    attributes = (
+        format_html(' integrity="{}" crossorigin="anonymous"', integrity)
+        if integrity
+        else ""
+    )
+    if name.endswith(".css"):
+        return format_html('<link rel="stylesheet" href="{}"{}>', url, attributes)
+    return format_html('<script src="{}"{}></script>', url, attributes)
@@ -0,0 +1,216 @@
+import json
+import os
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Entry, Topic
+
+
+class ImportLogCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser1", password="123")
+        Topic.objects.create(text="Existing", owner=cls.user)
+
+    def import_file(self, content, suffix, **options):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, "w", encoding="utf-8") as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, path)
+        out, err = StringIO(), StringIO()
+        call_command(
+            "import_log", path, user="testuser1", stdout=out, stderr=err, **options
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_jsonl_import_in_batches(self):
+        records = [{"topic": "Existing", "text": f"note {n}"} for n in range(5)]
+        records.append({"topic": "New one", "text": "fresh"})
+        out, _ = self.import_file(
+            "\n".join(json.dumps(record) for record in records), ".jsonl", batch_size=2
+        )
+        self.assertIn("Imported 6 entries, skipped 0", out)
+        existing = Topic.objects.get(text="Existing")
+        self.assertEqual(existing.entry_count, 5)
+        self.assertEqual(existing.topic.count(), 5)
+        self.assertEqual(Topic.objects.get(text="New one").owner, self.user)
+        self.assertTrue(Entry.objects.get(text="fresh").html)
+
+    def test_csv_import_skips_invalid_rows(self):
+        out, err = self.import_file(
+            'topic,text\nCSV topic,first\nCSV topic,""\n,orphan\n', ".csv"
+        )
+        self.assertIn("Imported 1 entries, skipped 2", out)
+        self.assertIn("Line 3 skipped", err)
+        self.assertEqual(Entry.objects.filter(topic__text="CSV topic").count(), 1)
+
+    def test_imported_entries_are_searchable(self):
+        self.import_file('{"topic": "Existing", "text": "bulk loaded"}\n', ".jsonl")
+        entry_ids = search.search_entry_ids(self.user.id, "bulk", limit=10)
+        self.assertEqual(entry_ids, [Entry.objects.get(text="bulk loaded").id])
+
+    def test_lines_that_are_not_objects_are_skipped(self):
+        out, err = self.import_file(
+            '[1, 2]\n"text"\n{"topic": "Existing", "text": "kept"}\n', ".jsonl"
+        )
+        self.assertIn("Imported 1 entries, skipped 2", out)
+        self.assertIn("Line 1 skipped: not a JSON object.", err)
+        self.assertIn("Line 2 skipped", err)
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = user1 = User.objects.create_user(
+            username="testuser1", password="123"
+        )
+        user2 = User.objects.create_user(username="testuser2", password="345")
+        topic = Topic.objects.create(text="Export me", owner=user1)
+        Entry.objects.create(topic=topic, text="first, with comma", owner=user1)
+        Entry.objects.create(topic=topic, text="second", owner=user1)
+        other = Topic.objects.create(text="Not mine", owner=user2)
+        Entry.objects.create(topic=other, text="hidden", owner=user2)
+
+    def setUp(self):
+        self.client.login(username="testuser1", password="123")
+
+    def download(self, file_format):
+        response = self.client.get(reverse("my_notes:export", args=(file_format,)))
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_ndjson_export(self):
+        lines = self.download("ndjson").decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([r["text"] for r in records], ["first, with comma", "second"])
+        self.assertEqual(records[0]["topic"], "Export me")
+
+    def test_csv_export(self):
+        content = self.download("csv").decode()
+        self.assertIn('"first, with comma"', content)
+        self.assertNotIn("hidden", content)
+
+    def test_markdown_export(self):
+        archive = zipfile.ZipFile(BytesIO(self.download("markdown")))
+        (name,) = archive.namelist()
+        self.assertTrue(name.startswith("export-me-"))
+        markdown = archive.read(name).decode()
+        self.assertTrue(markdown.startswith("# Export me"))
+        self.assertIn("second", markdown)
+
+    def test_empty_topics_survive_a_round_trip(self):
+        Topic.objects.create(text="Nothing yet", owner=self.user)
+        records = [json.loads(line) for line in self.download("ndjson").splitlines()]
+        self.assertEqual(records[-1]["topic"], "Nothing yet")
+        self.assertIsNone(records[-1]["text"])
+
+        for file_format, suffix in (("ndjson", ".jsonl"), ("csv", ".csv")):
+            with self.subTest(file_format):
+                content = self.download(file_format)
+                Topic.objects.filter(owner=self.user).delete()
+                handle, path = tempfile.mkstemp(suffix=suffix)
+                with os.fdopen(handle, "wb") as stream:
+                    stream.write(content)
+                self.addCleanup(os.remove, path)
+                call_command("import_log", path, user="testuser1", stdout=StringIO())
+                self.assertEqual(
+                    dict(
+                        Topic.objects.filter(owner=self.user).values_list(
+                            "text", "entry_count"
+                        )
+                    ),
+                    {"Export me": 2, "Nothing yet": 0},
+                )
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse("my_notes:export", args=("pdf",)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_command_writes_file(self):
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command("export_log", user="testuser1", format="csv", output=path)
+        with open(path, encoding="utf-8") as stream:
+            self.assertEqual(len(stream.read().splitlines()), 3)
+
+
+class BenchmarkCommandsTest(TestCase):
+    def test_seed_then_benchmark_every_route(self):
+        out = StringIO()
+        call_command("seed_benchmark", users=2, topics=2, entries=3, stdout=out)
+        self.assertIn("Seeded 2 users, 4 topics and 12 entries", out.getvalue())
+        bench = User.objects.get(username="bench0")
+        self.assertEqual(
+            sorted(
+                Topic.objects.filter(owner=bench).values_list("entry_count", flat=True)
+            ),
+            [3, 3],
+        )
+        self.assertTrue(search.search_entry_ids(bench.id, "django", 50))
+
+        handle, path = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        entries = Entry.objects.count()
+        call_command(
+            "benchmark_urls", iterations=2, warmup=0, output=path, stdout=StringIO()
+        )
+        self.assertEqual(Entry.objects.count(), entries)
+        with open(path) as stream:
+            results = json.load(stream)
+        self.assertIn("GET my_notes:topic", results["routes"])
+        self.assertIn("POST my_notes:new_entry", results["routes"])
+        self.assertIn("GET users:login", results["routes"])
+        self.assertEqual(results["routes"]["GET my_notes:topic"]["status"], [200])
+        self.assertGreater(results["routes"]["GET my_notes:export"]["bytes"], 0)
+        for result in results["routes"].values():
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+
+        out = StringIO()
+        call_command("benchmark_urls", iterations=1, warmup=0, compare=path, stdout=out)
+        self.assertIn("Compared with", out.getvalue())
+
+
+    def test_seeded_notes_are_in_the_changes_feed(self):
+        call_command("seed_benchmark", users=2, topics=3, entries=2, stdout=StringIO())
+        bench = User.objects.get(username="bench1")
+        self.client.force_login(bench)
+        data = json.loads(self.client.get(reverse("my_notes:api_changes")).content)
+        self.assertEqual(len(data["topics"]), 3)
+        self.assertEqual(len(data["entries"]), 6)
+
+
+class SqliteProfileTest(TestCase):
+    @override_settings(SQLITE_PRAGMAS=settings.SQLITE_PROFILES["production"])
+    def test_pragmas_applied_to_new_connections(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        # A new connection, whatever SQLITE_PROFILE the tests run with.
+        fresh = connections.create_connection(DEFAULT_DB_ALIAS)
+        self.addCleanup(fresh.close)
+        with fresh.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(
+                cursor.fetchone()[0],
+                settings.SQLITE_PROFILES["production"]["busy_timeout"],
+            )
+            cursor.execute("PRAGMA temp_store")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_benchmark_compares_profiles(self):
+        out = StringIO()
+        call_command(
+            "benchmark_sqlite", readers=2, writers=1, duration=0.2, rows=100, stdout=out
+        )
+        self.assertIn("default:", out.getvalue())
+        self.assertIn("production:", out.getvalue())
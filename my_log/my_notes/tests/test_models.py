@@ -1,6 +1,8 @@
 import time
+from io import StringIO
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
 
 from ..models import Entry, Topic
@@ -83,3 +85,23 @@ class EntryModelTest(TestCase):
         entry = Entry.objects.get(pk=1)
         topic = Topic.objects.get(pk=1)
         self.assertTrue(entry.date_added > topic.date_added)
+
+    def test_html_and_preview_rendered_on_save(self):
+        entry = Entry.objects.get(pk=1)
+        entry.text = "first line\n\n<second> line"
+        entry.save()
+        entry = Entry.objects.get(pk=1)
+        self.assertEqual(entry.html, "<p>first line</p>\n\n<p>&lt;second&gt; line</p>")
+        self.assertEqual(entry.preview, "first line\n\n<second> line")
+
+    def test_str_does_not_load_deferred_text(self):
+        entry = Entry.objects.defer("text").get(pk=1)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(entry), "testtesttesttesttest...")
+
+    def test_backfill_command_renders_missing_html(self):
+        Entry.objects.update(html="", preview="")
+        call_command("backfill_entry_html", stdout=StringIO())
+        entry = Entry.objects.get(pk=1)
+        self.assertEqual(entry.html, "<p>testtesttesttesttest</p>")
+        self.assertEqual(entry.preview, "testtesttesttesttest")
@@ -0,0 +1,84 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Entry, Topic
+
+# Most queries a request may run, including the session and user lookups of
+# an authenticated request. The budgets must hold at every data size.
+QUERY_BUDGETS = {
+    ("get", "my_notes:index"): 2,
+    ("get", "my_notes:topics"): 4,
+    ("get", "my_notes:topic"): 4,
+    ("get", "my_notes:search"): 4,
+    ("get", "my_notes:export"): 4,
+    ("get", "my_notes:new_topic"): 2,
+    ("post", "my_notes:new_topic"): 6,
+    ("get", "my_notes:new_entry"): 3,
+    ("post", "my_notes:new_entry"): 10,
+    ("get", "my_notes:edit_entry"): 3,
+    ("post", "my_notes:edit_entry"): 10,
+    ("get", "my_notes:delete_entry"): 3,
+    ("post", "my_notes:delete_entry"): 10,
+    ("get", "my_notes:api_topics"): 3,
+    ("get", "my_notes:api_entries"): 4,
+}
+
+DATA_SIZES = (1, 10, 50)
+
+
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="budget", password="123")
+        self.client.login(username="budget", password="123")
+
+    def create_log(self, size):
+        """Create ``size`` topics, the first of which has ``size`` entries."""
+        topics = [
+            Topic.objects.create(text=f"Topic {size}.{number}", owner=self.user)
+            for number in range(size)
+        ]
+        for number in range(size):
+            Entry.objects.create(
+                topic=topics[0], owner=self.user, text=f"entry {number}"
+            )
+        return topics[0]
+
+    def request_args(self, name, topic):
+        entry = Entry.objects.filter(topic=topic).latest("id")
+        values = {
+            "my_notes:topic": (topic.id,),
+            "my_notes:new_entry": (topic.id,),
+            "my_notes:api_entries": (topic.id,),
+            "my_notes:edit_entry": (entry.id,),
+            "my_notes:delete_entry": (entry.id,),
+            "my_notes:export": ("ndjson",),
+        }
+        return values.get(name, ())
+
+    def count_queries(self, method, name, topic):
+        url = reverse(name, args=self.request_args(name, topic))
+        data = {"q": "entry"} if name == "my_notes:search" else {"text": "note"}
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, url)
+        return len(queries)
+
+    def test_views_stay_within_budget_at_every_size(self):
+        counts = {}
+        for size in DATA_SIZES:
+            topic = self.create_log(size)
+            for (method, name), budget in QUERY_BUDGETS.items():
+                with self.subTest(method=method, view=name, size=size):
+                    count = self.count_queries(method, name, topic)
+                    self.assertLessEqual(count, budget)
+                    counts.setdefault((method, name), set()).add(count)
+        for (method, name), seen in counts.items():
+            with self.subTest(method=method, view=name):
+                self.assertEqual(len(seen), 1, f"query count grows with data: {seen}")
@@ -0,0 +1,209 @@
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from users.models import ShardAssignment
+
+from .. import sharding
+from ..models import Entry, Tombstone, Topic
+from ..pagination import KeysetPaginator, MergedKeysetPaginator
+from ..routers import ShardRouter
+
+
+class ShardDatabaseMixin:
+    """Add a second database in memory under the "shard" alias."""
+
+    @classmethod
+    def setUpClass(cls):
+        # The test runner checks the databases of every test before it runs
+        # any, so the alias is only named once it exists.
+        connections.databases["shard"] = {
+            **connections.databases["default"],
+            "NAME": ":memory:",
+        }
+        call_command("migrate", database="shard", verbosity=0)
+        cls.databases = {*cls.databases, "shard"}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        del cls.databases
+        del connections["shard"]
+        del connections.databases["shard"]
+
+
+class HashRingTest(SimpleTestCase):
+    def test_keys_spread_over_nodes(self):
+        ring = sharding.HashRing(["a", "b", "c"])
+        placed = [ring.node_for(key) for key in range(3000)]
+        for node in "abc":
+            self.assertGreater(placed.count(node), 600)
+
+    def test_new_node_only_takes_keys(self):
+        before = sharding.HashRing(["a", "b", "c"])
+        after = sharding.HashRing(["a", "b", "c", "d"])
+        moved = [
+            key for key in range(3000) if before.node_for(key) != after.node_for(key)
+        ]
+        self.assertTrue(all(after.node_for(key) == "d" for key in moved))
+        self.assertLess(len(moved), 3000 / 3)
+
+
+@override_settings(MY_NOTES_SHARDS=["default", "other"])
+class ShardRouterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser", password="123")
+
+    def setUp(self):
+        cache.clear()
+        self.router = ShardRouter()
+
+    def test_routes_notes_to_the_owners_shard(self):
+        shard = sharding.ring().node_for(self.user.pk)
+        self.assertEqual(sharding.shard_for(self.user.pk), shard)
+        with sharding.owner_scope(self.user):
+            self.assertEqual(self.router.db_for_read(Topic), shard)
+            self.assertEqual(self.router.db_for_write(Entry), shard)
+            self.assertIsNone(self.router.db_for_read(User))
+        self.assertEqual(self.router.db_for_write(Topic, instance=self.user), shard)
+        self.assertIsNone(self.router.db_for_read(Topic))
+
+    def test_assignment_overrides_the_ring(self):
+        other = ({"default", "other"} - {sharding.shard_for(self.user.pk)}).pop()
+        ShardAssignment.objects.create(owner=self.user, database=other)
+        cache.delete(sharding.assignment_key(self.user.pk))
+        self.assertEqual(sharding.shard_for(self.user.pk), other)
+
+    def test_assignment_is_cached_only_in_a_shared_cache(self):
+        shard = sharding.shard_for(self.user.pk)
+        other = ({"default", "other"} - {shard}).pop()
+        ShardAssignment.objects.create(owner=self.user, database=other)
+        self.assertEqual(sharding.shard_for(self.user.pk), other)
+        with self.settings(SHARED_CACHE=True):
+            self.assertEqual(sharding.shard_for(self.user.pk), other)
+            ShardAssignment.objects.filter(owner=self.user).update(database=shard)
+            self.assertEqual(sharding.shard_for(self.user.pk), other)
+
+    def test_central_tables_migrate_on_default_only(self):
+        self.assertTrue(self.router.allow_migrate("other", "my_notes", "entry"))
+        self.assertFalse(self.router.allow_migrate("other", "auth", "user"))
+        self.assertTrue(self.router.allow_migrate("default", "users"))
+        self.assertFalse(self.router.allow_migrate("replica1", "my_notes"))
+
+    def test_move_rejects_the_current_shard(self):
+        current = sharding.shard_for(self.user.pk)
+        with self.assertRaisesMessage(CommandError, "already on"):
+            call_command("move_user_shard", "testuser", current, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "is not one of"):
+            call_command("move_user_shard", "testuser", "nowhere", stdout=StringIO())
+
+
+@override_settings(MY_NOTES_SHARDS=["default", "shard"])
+class MoveUserShardTest(ShardDatabaseMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="mover", password="123")
+        cache.clear()
+        cls.source = sharding.shard_for(cls.user.pk)
+        cls.target = ({"default", "shard"} - {cls.source}).pop()
+        topic = Topic.objects.create(text="Moving", owner=cls.user)
+        Topic.objects.create(text="Empty", owner=cls.user)
+        for day in (1, 2):
+            entry = Entry(topic=topic, owner=cls.user, text=f"day {day}")
+            entry.client_key = f"key-{day}"
+            entry.save()
+            Entry.objects.using(cls.source).filter(pk=entry.pk).update(
+                date_added=datetime(2020, 1, day, tzinfo=timezone.utc)
+            )
+        call_command("rebuild_topic_counters", database=cls.source, stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+
+    def snapshot(self, db):
+        return (
+            list(
+                Topic.objects.using(db)
+                .order_by("text")
+                .values_list("text", "date_added", "entry_count", "last_entry_at")
+            ),
+            list(
+                Entry.objects.using(db)
+                .order_by("date_added")
+                .values_list("topic__text", "text", "date_added", "client_key")
+            ),
+        )
+
+    def test_move_copies_everything_to_the_target(self):
+        before = self.snapshot(self.source)
+        self.assertEqual(len(before[1]), 2)
+        call_command("move_user_shard", "mover", self.target, stdout=StringIO())
+
+        self.assertEqual(sharding.shard_for(self.user.pk), self.target)
+        self.assertEqual(self.snapshot(self.target), before)
+        self.assertEqual(self.snapshot(self.source), ([], []))
+
+    def test_deleting_the_user_clears_every_shard(self):
+        Topic.objects.using(self.target).create(text="Stray", owner=self.user)
+        self.user.delete()
+        for db in ("default", "shard"):
+            self.assertFalse(Topic.objects.using(db).exists())
+            self.assertFalse(Entry.objects.using(db).exists())
+            self.assertFalse(Tombstone.objects.using(db).exists())
+
+
+@override_settings(MY_NOTES_SHARDS=["shard"])
+class DedicatedShardTest(ShardDatabaseMixin, TestCase):
+    def test_deleting_the_user_leaves_the_default_database_alone(self):
+        user = User.objects.create_user(username="dedicated", password="123")
+        with sharding.owner_scope(user):
+            topic = Topic.objects.create(text="Sharded", owner=user)
+            Entry.objects.create(topic=topic, owner=user, text="entry")
+        self.assertEqual(topic._state.db, "shard")
+
+        with CaptureQueriesContext(connections["default"]) as queries:
+            user.delete()
+        # The default database has no my_notes tables in this setup.
+        self.assertFalse([query for query in queries if "my_notes" in query["sql"]])
+        self.assertFalse(Topic.objects.using("shard").exists())
+        self.assertFalse(Entry.objects.using("shard").exists())
+        self.assertFalse(Tombstone.objects.using("shard").exists())
+
+
+class MergedKeysetPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ("first", "second"):
+            owner = User.objects.create_user(username=name, password="123")
+            for number in range(7):
+                Topic.objects.create(text=f"{name} {number}", owner=owner)
+
+    def test_pages_match_a_single_queryset(self):
+        querysets = [
+            Topic.objects.filter(owner__username=name) for name in ("first", "second")
+        ]
+        merged = MergedKeysetPaginator(querysets, 4, descending=False)
+        single = KeysetPaginator(Topic.objects.all(), 4, descending=False)
+
+        after, pages = None, []
+        while True:
+            page, expected = merged.page(after=after), single.page(after=after)
+            self.assertEqual(list(page), list(expected))
+            self.assertEqual(page.next_cursor, expected.next_cursor)
+            pages.append(page)
+            if not page.has_next():
+                break
+            after = page.next_cursor
+        self.assertEqual(len(pages), 4)
+
+        previous = merged.page(before=pages[-1].previous_cursor)
+        self.assertEqual(list(previous), list(pages[-2]))
+        self.assertTrue(previous.has_previous())
@@ -0,0 +1,136 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import sync
+from ..bulk import insert_entries
+from ..models import ChangeCounter, Entry, Tombstone, Topic
+from ..views import ChangesApi
+
+
+class NextSeqTest(TestCase):
+    def test_with_and_without_returning(self):
+        for returning in (True, False):
+            with self.subTest(returning=returning), mock.patch.object(
+                sync, "_can_return", return_value=returning
+            ):
+                first = sync.next_seq("default")
+                self.assertEqual(sync.next_seq("default", 3), first + 3)
+
+                ChangeCounter.objects.all().delete()
+                self.assertEqual(sync.next_seq("default", 2), 2)
+                self.assertEqual(ChangeCounter.objects.get().value, 2)
+
+
+class ChangesApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser", password="123")
+        other = User.objects.create_user(username="other", password="123")
+        cls.topic = Topic.objects.create(text="Synced", owner=cls.user)
+        cls.entries = [
+            Entry.objects.create(topic=cls.topic, owner=cls.user, text=f"note {n}")
+            for n in range(3)
+        ]
+        Topic.objects.create(text="Not yours", owner=other)
+
+    def setUp(self):
+        self.client.login(username="testuser", password="123")
+        self.url = reverse("my_notes:api_changes")
+
+    def changes(self, since=None, status=200):
+        params = {"since": since} if since else {}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status)
+        return json.loads(response.content)
+
+    def test_full_then_empty_sync(self):
+        data = self.changes()
+        self.assertEqual([topic["text"] for topic in data["topics"]], ["Synced"])
+        self.assertEqual(
+            [entry["id"] for entry in data["entries"]],
+            [entry.id for entry in self.entries],
+        )
+        self.assertEqual(set(data["entries"][0]), set(sync.ENTRY_FIELDS))
+        self.assertFalse(data["has_more"] or data["reset"])
+
+        again = self.changes(data["next"])
+        self.assertEqual(again["topics"] + again["entries"] + again["deleted"], [])
+        self.assertEqual(again["next"], data["next"])
+
+    def test_edits_and_deletes_since_a_token(self):
+        token = self.changes()["next"]
+        self.client.post(
+            reverse("my_notes:edit_entry", args=(self.entries[0].id,)),
+            {"text": "edited"},
+        )
+        self.client.post(reverse("my_notes:delete_entry", args=(self.entries[1].id,)))
+
+        data = self.changes(token)
+        self.assertEqual(data["topics"], [])
+        self.assertEqual([entry["text"] for entry in data["entries"]], ["edited"])
+        self.assertEqual(data["deleted"], [{"type": "entry", "id": self.entries[1].id}])
+
+    def test_deleting_a_topic_leaves_tombstones_for_its_entries(self):
+        token = self.changes()["next"]
+        topic_id = self.topic.id
+        self.topic.delete()
+        deleted = self.changes(token)["deleted"]
+        self.assertEqual(len(deleted), 4)
+        self.assertEqual(deleted[-1], {"type": "topic", "id": topic_id})
+
+    def test_pages_follow_the_sequence(self):
+        insert_entries(
+            [
+                Entry(topic=self.topic, owner=self.user, text=f"bulk {n}")
+                for n in range(3)
+            ]
+        )
+        seen, token = [], None
+        with mock.patch.object(ChangesApi, "paginate_by", 2):
+            while True:
+                data = self.changes(token)
+                seen.extend(data["topics"] + data["entries"])
+                token = data["next"]
+                if not data["has_more"]:
+                    break
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len({entry["id"] for entry in seen[1:]}), 6)
+
+    def test_sequence_numbers_are_unique(self):
+        Entry.objects.filter(pk=self.entries[0].pk).delete()
+        seqs = [
+            *Topic.objects.values_list("seq", flat=True),
+            *Entry.objects.values_list("seq", flat=True),
+            *Tombstone.objects.values_list("seq", flat=True),
+        ]
+        self.assertEqual(len(seqs), len(set(seqs)))
+        self.assertNotIn(0, seqs)
+
+    def test_token_from_another_database_resets(self):
+        data = self.changes(sync.encode_token("shard9", 10**9))
+        self.assertTrue(data["reset"])
+        self.assertEqual(len(data["entries"]), 3)
+        self.changes("not-a-token", status=400)
+
+    def test_tokens_from_before_pruned_tombstones_reset(self):
+        token = self.changes()["next"]
+        self.client.post(reverse("my_notes:delete_entry", args=(self.entries[0].id,)))
+        latest = self.changes(token)["next"]
+        call_command("prune_tombstones", days=0, stdout=StringIO())
+        self.assertFalse(Tombstone.objects.exists())
+
+        data = self.changes(token)
+        self.assertTrue(data["reset"])
+        self.assertEqual(len(data["entries"]), 2)
+        self.assertFalse(self.changes(latest)["reset"])
+
+    def test_query_count_does_not_depend_on_the_log(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
@@ -1,12 +1,45 @@
-from django.contrib.auth.models import User
-from django.test import TestCase, override_settings
+import asyncio
+import gzip
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipIf
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from .. import api, async_views, compression, routers, vendor, views
 from ..forms import EntryForm, TopicForm
+from ..middleware import CompressionMiddleware, ServerTimingMiddleware
 from ..models import Entry, Topic
 
 
 class IndexViewTest(TestCase):
+    def setUp(self):
+        # Anonymous pages are served from the cache after the first hit.
+        cache.clear()
+
     def test_index_view_url(self):
         response = self.client.get("")
         self.assertEqual(response.status_code, 200)
@@ -51,6 +84,51 @@ class TopicsViewTest(TestCase):
         )
 
 
+class OwnerTopicsViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user1 = User.objects.create_user(username="testuser1", password="123")
+        user1.save()
+        user2 = User.objects.create_user(username="testuser2", password="345")
+        user2.save()
+        for topic in range(25):
+            Topic.objects.create(text=f"Topic#{topic}", owner=user1)
+        Topic.objects.create(text="Foreign topic", owner=user2)
+
+    def test_logged_user_sees_own_topics_only(self):
+        self.client.login(username="testuser2", password="345")
+        response = self.client.get(reverse("my_notes:topics"))
+        self.assertEqual(
+            [str(topic) for topic in response.context_data["themes"]],
+            ["Foreign topic"],
+        )
+        self.assertFalse(response.context_data["public"])
+
+    def test_public_mode_lists_every_topic(self):
+        self.client.login(username="testuser2", password="345")
+        response = self.client.get(reverse("my_notes:topics"), {"public": ""})
+        self.assertTrue(response.context_data["public"])
+        self.assertEqual(len(response.context_data["themes"]), 20)
+
+    @override_settings(MY_NOTES_PUBLIC_TOPICS=False)
+    def test_anonymous_user_redirected_without_public_mode(self):
+        response = self.client.get(reverse("my_notes:topics"))
+        self.assertRedirects(response, "/users/login/?next=/topics/")
+
+    def test_topics_are_paginated(self):
+        self.client.login(username="testuser1", password="123")
+        response = self.client.get(reverse("my_notes:topics"))
+        page = response.context_data["page"]
+        self.assertEqual(str(page[0]), "Topic#0")
+        response = self.client.get(
+            reverse("my_notes:topics"), {"after": page.next_cursor}
+        )
+        self.assertEqual(
+            [str(topic) for topic in response.context_data["themes"]],
+            [f"Topic#{topic}" for topic in range(20, 25)],
+        )
+
+
 class ThemeViewTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -106,6 +184,107 @@ class ThemeViewTest(TestCase):
         self.assertTemplateUsed(response, "404.html")
 
 
+class ThemePaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="testuser1", password="123")
+        user.save()
+        cls.topic = Topic.objects.create(text="Long topic", owner=user)
+        for number in range(25):
+            Entry.objects.create(topic=cls.topic, text=f"entry {number}", owner=user)
+
+    def setUp(self):
+        self.client.login(username="testuser1", password="123")
+        self.url = reverse("my_notes:topic", kwargs={"topic_id": self.topic.id})
+
+    def test_first_page_holds_newest_entries(self):
+        response = self.client.get(self.url)
+        page = response.context_data["page"]
+        self.assertEqual(len(page), 20)
+        self.assertEqual(page[0].text, "entry 24")
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+    def test_older_and_newer_links_walk_the_entries(self):
+        first_page = self.client.get(self.url).context_data["page"]
+        response = self.client.get(self.url, {"after": first_page.next_cursor})
+        second_page = response.context_data["page"]
+        self.assertEqual([e.text for e in second_page][0], "entry 4")
+        self.assertEqual(len(second_page), 5)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        response = self.client.get(self.url, {"before": second_page.previous_cursor})
+        self.assertEqual(list(response.context_data["page"]), list(first_page))
+
+    def test_entries_with_same_date_are_not_skipped(self):
+        Entry.objects.update(date_added=self.topic.date_added)
+        first_page = self.client.get(self.url).context_data["page"]
+        response = self.client.get(self.url, {"after": first_page.next_cursor})
+        seen = list(first_page) + list(response.context_data["page"])
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"after": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
+class ThemeFragmentCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="testuser1", password="123")
+        user.save()
+        cls.topic = Topic.objects.create(text="Cached topic", owner=user)
+        cls.entry = Entry.objects.create(
+            topic=cls.topic, text="first version", owner=user
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="testuser1", password="123")
+        self.url = reverse("my_notes:topic", kwargs={"topic_id": self.topic.id})
+
+    def test_unchanged_entries_are_served_from_cache(self):
+        self.client.get(self.url)
+        # A write that bypasses the views leaves the cached fragments in place.
+        Entry.objects.filter(pk=self.entry.pk).update(text="changed behind our back")
+        response = self.client.get(self.url)
+        self.assertContains(response, "first version")
+
+    def test_edit_invalidates_entry_fragment(self):
+        self.client.get(self.url)
+        self.client.post(
+            reverse("my_notes:edit_entry", kwargs={"entry_id": self.entry.id}),
+            {"text": "second version"},
+        )
+        response = self.client.get(self.url)
+        self.assertContains(response, "second version")
+        self.assertNotContains(response, "first version")
+
+    def test_new_and_deleted_entries_invalidate_topic_page(self):
+        self.client.get(self.url)
+        self.client.post(
+            reverse("my_notes:new_entry", kwargs={"topic_id": self.topic.id}),
+            {"text": "another entry"},
+        )
+        self.assertContains(self.client.get(self.url), "another entry")
+        self.client.post(reverse("my_notes:delete_entry", kwargs={"pk": self.entry.id}))
+        self.assertNotContains(self.client.get(self.url), "first version")
+
+    def test_writes_by_other_workers_invalidate_the_page(self):
+        self.client.get(self.url)
+        # Another worker's cache is out of reach; only the database is shared.
+        dummy = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+        with override_settings(CACHES=dummy):
+            self.entry.text = "edited elsewhere"
+            self.entry.save()
+            Entry.objects.create(
+                topic=self.topic, text="added elsewhere", owner=self.entry.owner
+            )
+        response = self.client.get(self.url)
+        self.assertContains(response, "edited elsewhere")
+        self.assertContains(response, "added elsewhere")
+
+
 class NewTopicViewTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -371,3 +550,818 @@ class DeleteEntryViewTest(TestCase):
         )
         current_number_of_entries = Entry.objects.count()
         self.assertEqual(initial_number_of_entries, current_number_of_entries + 1)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user1 = User.objects.create_user(username="testuser1", password="123")
+        user1.save()
+        user2 = User.objects.create_user(username="testuser2", password="345")
+        user2.save()
+        theme = Topic.objects.create(text="Databases", owner=user1)
+        Entry.objects.create(topic=theme, text="indexes make lookups fast", owner=user1)
+        Entry.objects.create(topic=theme, text="vacuum reclaims space", owner=user1)
+        other = Topic.objects.create(text="Secrets", owner=user2)
+        Entry.objects.create(topic=other, text="indexes are private", owner=user2)
+
+    def setUp(self):
+        self.client.login(username="testuser1", password="123")
+
+    def search(self, query):
+        response = self.client.get(reverse("my_notes:search"), {"q": query})
+        return [entry.text for entry in response.context_data["results"]]
+
+    def test_redirect_if_not_logged_in(self):
+        self.client.logout()
+        response = self.client.get(reverse("my_notes:search"))
+        self.assertRedirects(response, "/users/login/?next=/search/")
+
+    def test_search_matches_own_entries_only(self):
+        self.assertEqual(self.search("index"), ["indexes make lookups fast"])
+
+    def test_owner_id_is_not_searchable_text(self):
+        user = User.objects.get(username="testuser1")
+        self.assertEqual(self.search(str(user.pk)), [])
+
+    def test_search_matches_topic_text(self):
+        self.assertEqual(len(self.search("databases")), 2)
+
+    def test_empty_query_has_no_results(self):
+        self.assertEqual(self.search("  "), [])
+
+    def test_index_follows_edit_and_delete(self):
+        entry = Entry.objects.get(text="vacuum reclaims space")
+        self.client.post(
+            reverse("my_notes:edit_entry", kwargs={"entry_id": entry.id}),
+            {"text": "analyze refreshes statistics"},
+        )
+        self.assertEqual(self.search("vacuum"), [])
+        self.assertEqual(self.search("statistics"), ["analyze refreshes statistics"])
+        self.client.post(reverse("my_notes:delete_entry", kwargs={"pk": entry.id}))
+        self.assertEqual(self.search("statistics"), [])
+
+    def test_index_follows_topic_rename(self):
+        topic = Topic.objects.get(text="Databases")
+        topic.text = "Storage engines"
+        topic.save()
+        self.assertEqual(self.search("databases"), [])
+        self.assertEqual(len(self.search("storage")), 2)
+
+    def test_page_number_is_clamped(self):
+        response = self.client.get(
+            reverse("my_notes:search"), {"q": "index", "page": 10**30}
+        )
+        self.assertEqual(response.status_code, 200)
+        view = response.context_data["view"]
+        self.assertEqual(response.context_data["page_number"], view.max_pages)
+
+    @mock.patch.object(views.Search, "paginate_by", 1)
+    def test_last_page_has_no_next_page(self):
+        response = self.client.get(reverse("my_notes:search"), {"q": "databases"})
+        self.assertTrue(response.context_data["has_next"])
+        with mock.patch.object(views.Search, "max_pages", 1):
+            response = self.client.get(reverse("my_notes:search"), {"q": "databases"})
+        self.assertFalse(response.context_data["has_next"])
+
+
+class TopicCountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="testuser1", password="123")
+        user.save()
+        cls.topic = Topic.objects.create(text="Counted topic", owner=user)
+
+    def setUp(self):
+        self.client.login(username="testuser1", password="123")
+
+    def add_entry(self, text):
+        self.client.post(
+            reverse("my_notes:new_entry", kwargs={"topic_id": self.topic.id}),
+            {"text": text},
+        )
+        return Entry.objects.latest("id")
+
+    def test_counters_follow_new_edit_and_delete(self):
+        first = self.add_entry("first")
+        second = self.add_entry("second")
+        topic = Topic.objects.get(pk=self.topic.pk)
+        self.assertEqual(topic.entry_count, 2)
+        self.assertEqual(topic.last_entry_at, second.date_added)
+
+        self.client.post(
+            reverse("my_notes:edit_entry", kwargs={"entry_id": first.id}),
+            {"text": "first, edited"},
+        )
+        topic.refresh_from_db()
+        self.assertEqual(topic.last_entry_at, Entry.objects.get(pk=first.pk).date_added)
+
+        self.client.post(reverse("my_notes:delete_entry", kwargs={"pk": first.id}))
+        topic.refresh_from_db()
+        self.assertEqual(topic.entry_count, 1)
+        self.assertEqual(topic.last_entry_at, second.date_added)
+
+    def test_topics_page_shows_counters(self):
+        self.add_entry("first")
+        response = self.client.get(reverse("my_notes:topics"))
+        self.assertContains(response, "1 entry")
+
+    def test_rebuild_command_repairs_drift(self):
+        entry = self.add_entry("first")
+        Topic.objects.update(entry_count=42, last_entry_at=None)
+        call_command("rebuild_topic_counters", stdout=StringIO())
+        topic = Topic.objects.get(pk=self.topic.pk)
+        self.assertEqual(topic.entry_count, 1)
+        self.assertEqual(topic.last_entry_at, entry.date_added)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser1", password="123")
+        cls.topic = Topic.objects.create(text="Cached topic", owner=cls.user)
+        Entry.objects.create(topic=cls.topic, text="first", owner=cls.user)
+
+    def setUp(self):
+        self.client.login(username="testuser1", password="123")
+        self.theme_url = reverse("my_notes:topic", kwargs={"topic_id": self.topic.id})
+
+    def assertRevalidates(self, url):
+        response = self.client.get(url)
+        self.assertTrue(response.has_header("Last-Modified"))
+        etag = response["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        return etag
+
+    def test_theme_answers_304(self):
+        self.assertRevalidates(self.theme_url)
+
+    def test_topics_answers_304(self):
+        self.assertRevalidates(reverse("my_notes:topics"))
+
+    def test_new_entry_changes_validators(self):
+        theme_etag = self.assertRevalidates(self.theme_url)
+        topics_etag = self.assertRevalidates(reverse("my_notes:topics"))
+        self.client.post(
+            reverse("my_notes:new_entry", kwargs={"topic_id": self.topic.id}),
+            {"text": "second"},
+        )
+        response = self.client.get(self.theme_url, HTTP_IF_NONE_MATCH=theme_etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            reverse("my_notes:topics"), HTTP_IF_NONE_MATCH=topics_etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleting_an_older_entry_moves_last_modified(self):
+        older = Entry.objects.create(topic=self.topic, text="older", owner=self.user)
+        Entry.objects.filter(pk=older.pk).update(date_added=self.topic.date_added)
+        Topic.objects.filter(pk=self.topic.pk).update(
+            updated_at=self.topic.date_added - timedelta(days=1)
+        )
+        last_modified = self.client.get(self.theme_url)["Last-Modified"]
+        self.client.post(reverse("my_notes:delete_entry", kwargs={"pk": older.pk}))
+        response = self.client.get(self.theme_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_renaming_a_topic_changes_the_topics_etag(self):
+        etag = self.assertRevalidates(reverse("my_notes:topics"))
+        self.topic.text = "Renamed topic"
+        self.topic.save()
+        response = self.client.get(reverse("my_notes:topics"), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Renamed topic")
+
+    def test_deleting_a_topic_moves_last_modified(self):
+        older = Topic.objects.create(text="Older topic", owner=self.user)
+        Topic.objects.update(updated_at=self.topic.updated_at - timedelta(days=1))
+        last_modified = self.client.get(reverse("my_notes:topics"))["Last-Modified"]
+        older.delete()
+        response = self.client.get(
+            reverse("my_notes:topics"), HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(MY_NOTES_PUBLIC_TOPICS=True)
+    def test_public_topics_skip_the_validators(self):
+        self.client.logout()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("my_notes:topics"))
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_other_page_has_other_etag(self):
+        etag = self.client.get(self.theme_url)["ETag"]
+        response = self.client.get(
+            self.theme_url, {"after": "x"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertNotEqual(response.status_code, 304)
+
+
+class AsyncViewsTest(TransactionTestCase):
+    # The async views query from pool threads with their own connections, so
+    # the test data has to be committed.
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser1", password="123")
+        self.topic = Topic.objects.create(text="Async topic", owner=self.user)
+        Entry.objects.create(topic=self.topic, text="served async", owner=self.user)
+        self.factory = RequestFactory()
+
+    def call(self, view, path, user, **kwargs):
+        request = self.factory.get(path)
+        request.user = user
+        return async_to_sync(view)(request, **kwargs)
+
+    def test_index(self):
+        response = self.call(async_views.index, "/", AnonymousUser())
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Track your learning!")
+
+    def test_topics(self):
+        response = self.call(async_views.topics, "/topics/", self.user)
+        self.assertContains(response, "Async topic")
+
+    def test_theme(self):
+        response = self.call(
+            async_views.theme, "/topic/", self.user, topic_id=self.topic.id
+        )
+        self.assertContains(response, "served async")
+
+    def test_theme_requires_login(self):
+        response = self.call(
+            async_views.theme, "/topic/1", AnonymousUser(), topic_id=self.topic.id
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, "/users/login/?next=/topic/1")
+
+    async def download(self, path, cookie):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": b"",
+            "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+        }
+
+        communicator = ApplicationCommunicator(async_views.ASGIHandler(), scope)
+        await communicator.send_input({"type": "http.request"})
+        start = await communicator.receive_output(5)
+        body = b""
+        while True:
+            message = await communicator.receive_output(5)
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                return start["status"], body
+
+    def test_export_streams_from_the_pool(self):
+        self.client.force_login(self.user)
+        cookie = self.client.cookies.output(header="", attrs=[]).strip()
+        status, body = async_to_sync(self.download)("/export/ndjson/", cookie)
+        self.assertEqual(status, 200)
+        lines = body.decode().splitlines()
+        self.assertEqual(json.loads(lines[-1])["text"], "served async")
+
+    def test_more_exports_than_pool_threads(self):
+        for number in range(20):
+            Entry.objects.create(
+                topic=self.topic, text=f"entry {number}", owner=self.user
+            )
+        self.client.force_login(self.user)
+        cookie = self.client.cookies.output(header="", attrs=[]).strip()
+
+        async def download_all():
+            return await asyncio.gather(
+                *(self.download("/export/ndjson/", cookie) for _ in range(6))
+            )
+
+        # Every pool thread ends up producing an export for a client that
+        # waits on the event loop.
+        executor = ThreadPoolExecutor(max_workers=2)
+        with mock.patch.object(async_views, "executor", executor):
+            downloads = async_to_sync(download_all)()
+        executor.shutdown()
+        for status, body in downloads:
+            self.assertEqual(status, 200)
+            self.assertEqual(len(body.decode().splitlines()), 21)
+
+    @override_settings(MY_NOTES_SERVER_TIMING=True)
+    def test_server_timing_counts_the_pool_queries(self):
+        async def get_response(request):
+            return await async_views.topics(request)
+
+        request = self.factory.get("/topics/")
+        request.user = self.user
+        response = async_to_sync(ServerTimingMiddleware(get_response))(request)
+        self.assertRegex(
+            response["Server-Timing"], r'db;dur=[\d.]+;desc="[1-9]\d* queries"'
+        )
+
+    @override_settings(
+        # Django only logs the adapted middleware in debug mode.
+        DEBUG=True,
+        MY_NOTES_SERVER_TIMING=True,
+        MY_NOTES_ANONYMOUS_CACHE_TIMEOUT=60,
+        MY_NOTES_COMPRESSION=True,
+        MY_NOTES_REPLICAS=["default"],
+        MY_NOTES_SHARDS=["default"],
+    )
+    def test_no_middleware_is_adapted_to_sync(self):
+        with self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
+
+
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser", password="123")
+        cls.topic = Topic.objects.create(text="Timed", owner=cls.user)
+        Entry.objects.create(topic=cls.topic, owner=cls.user, text="Entry")
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse("my_notes:index"))
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(MY_NOTES_SERVER_TIMING=True)
+    def test_header_and_log_line(self):
+        self.client.login(username="testuser", password="123")
+        with self.assertLogs("my_notes.server_timing", "INFO") as logs:
+            response = self.client.get(reverse("my_notes:topic", args=(self.topic.id,)))
+        metrics = [part.strip() for part in response["Server-Timing"].split(",")]
+        self.assertEqual(
+            [metric.split(";")[0] for metric in metrics],
+            ["auth", "db", "view", "render", "total"],
+        )
+        self.assertIn('desc="4 queries"', response["Server-Timing"])
+        record = logs.records[0]
+        self.assertEqual(record.status, 200)
+        self.assertEqual(record.queries, 4)
+        self.assertEqual(
+            set(record.timings_ms), {"auth", "db", "view", "render", "total"}
+        )
+
+    @override_settings(MY_NOTES_SERVER_TIMING=True)
+    def test_db_is_left_out_without_queries(self):
+        middleware = ServerTimingMiddleware(lambda request: HttpResponse())
+        response = middleware(RequestFactory().get("/"))
+        self.assertTrue(response["Server-Timing"].startswith("total;dur="))
+
+    @override_settings(MY_NOTES_SERVER_TIMING=True)
+    def test_redirect_without_template(self):
+        with self.assertLogs("my_notes.server_timing", "INFO"):
+            response = self.client.get(reverse("my_notes:new_topic"))
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn("render", response["Server-Timing"])
+        self.assertIn("view;dur=", response["Server-Timing"])
+
+
+class OwnershipTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="123")
+        User.objects.create_user(username="intruder", password="123")
+        cls.topic = Topic.objects.create(text="Private", owner=cls.owner)
+        cls.entry = Entry.objects.create(topic=cls.topic, owner=cls.owner, text="Mine")
+
+    def setUp(self):
+        self.client.login(username="intruder", password="123")
+
+    def test_other_users_topic_is_not_found(self):
+        response = self.client.get(reverse("my_notes:topic", args=(self.topic.id,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_new_entry_post_checks_ownership(self):
+        response = self.client.post(
+            reverse("my_notes:new_entry", args=(self.topic.id,)), {"text": "Spam"}
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Entry.objects.filter(topic=self.topic).count(), 1)
+
+    def test_entry_writes_check_ownership(self):
+        for name in ("my_notes:edit_entry", "my_notes:delete_entry"):
+            response = self.client.post(
+                reverse(name, args=(self.entry.id,)), {"text": "Changed"}
+            )
+            self.assertEqual(response.status_code, 404)
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.text, "Mine")
+
+    def test_for_user_loads_entry_with_topic_in_one_query(self):
+        with self.assertNumQueries(1):
+            entry = Entry.objects.for_user(self.owner).get(id=self.entry.id)
+            self.assertEqual(entry.topic.text, "Private")
+
+
+@override_settings(MY_NOTES_REPLICAS=["default"])
+class ReplicaRoutingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser", password="123")
+        cls.topic = Topic.objects.create(text="Replicated", owner=cls.user)
+
+    def setUp(self):
+        self.client.login(username="testuser", password="123")
+        patcher = mock.patch("my_notes.routers.random.choice", return_value="default")
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_listing_views_read_from_replicas(self):
+        response = self.client.get(reverse("my_notes:topic", args=(self.topic.id,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.choose_replica.called)
+        self.assertFalse(routers.replica_reads.get())
+
+    def test_write_views_use_default_and_set_sticky_cookie(self):
+        response = self.client.post(
+            reverse("my_notes:new_entry", args=(self.topic.id,)), {"text": "New"}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(self.choose_replica.called)
+        cookie = response.cookies[settings.MY_NOTES_REPLICA_STICKY_COOKIE]
+        self.assertEqual(cookie["max-age"], settings.MY_NOTES_REPLICA_STICKY_SECONDS)
+
+        # The writer reads their own change from the default database.
+        self.client.get(reverse("my_notes:topic", args=(self.topic.id,)))
+        self.assertFalse(self.choose_replica.called)
+
+    def test_router_sends_writes_to_default(self):
+        router = routers.ReplicaRouter()
+        with routers.reading_from_replicas():
+            self.assertEqual(router.db_for_read(Topic), "default")
+            self.assertEqual(router.db_for_write(Topic), "default")
+            self.assertIsNone(router.db_for_read(User))
+        self.assertTrue(self.choose_replica.called)
+
+
+@override_settings(
+    USER_CACHE_TIMEOUT=60,
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+)
+class CachedUserTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser", password="123")
+        cls.topic = Topic.objects.create(text="Cached", owner=cls.user)
+        Entry.objects.create(topic=cls.topic, owner=cls.user, text="Entry")
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="testuser", password="123")
+        self.url = reverse("my_notes:topic", args=(self.topic.id,))
+        self.client.get(self.url)
+
+    def test_theme_queries_only_notes(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context["user"], self.user)
+
+    def test_password_change_signs_out_other_sessions(self):
+        self.user.set_password("456")
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_logout_evicts_the_user(self):
+        self.client.get(reverse("users:logout"))
+        self.assertIsNone(cache.get(f"users:user:{self.user.pk}"))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(MY_NOTES_ANONYMOUS_CACHE_TIMEOUT=300)
+class AnonymousPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_second_hit_skips_view_and_database(self):
+        self.client.get(reverse("my_notes:index"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("my_notes:index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.templates, [])
+        self.assertIn("Cookie", response["Vary"])
+
+    def test_cached_login_form_gets_the_visitors_csrf_token(self):
+        User.objects.create_user(username="testuser", password="123")
+        self.client.get(reverse("users:login"))
+        client = Client(enforce_csrf_checks=True)
+        response = client.get(reverse("users:login"))
+        self.assertEqual(response.templates, [])
+        token = re.search(
+            r'name="csrfmiddlewaretoken" value="(\w+)"', response.content.decode()
+        ).group(1)
+        response = client.post(
+            reverse("users:login"),
+            {"username": "testuser", "password": "123", "csrfmiddlewaretoken": token},
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_only_known_query_parameters_are_cached(self):
+        for name, params in (
+            ("my_notes:index", {"utm_source": "x"}),
+            ("users:login", {"next": "/topics/"}),
+        ):
+            self.client.get(reverse(name), params)
+            response = self.client.get(reverse(name), params)
+            self.assertNotEqual(response.templates, [])
+
+        self.client.get(reverse("my_notes:index"), {"page": "2", "after": "a"})
+        response = self.client.get(reverse("my_notes:index"), {"after": "a", "page": 2})
+        self.assertEqual(response.templates, [])
+
+    def test_signed_in_visitors_bypass_the_cache(self):
+        User.objects.create_user(username="testuser", password="123")
+        self.client.get(reverse("my_notes:index"))
+        self.client.login(username="testuser", password="123")
+        response = self.client.get(reverse("my_notes:index"))
+        self.assertTemplateUsed(response, "my_notes/index.html")
+        self.assertContains(response, "log out")
+
+
+class StaticFilesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        vendor.is_vendored.cache_clear()
+        self.addCleanup(vendor.is_vendored.cache_clear)
+
+    def test_layout_links_the_vendored_assets(self):
+        with mock.patch.object(vendor, "is_vendored", return_value=True):
+            response = self.client.get(reverse("my_notes:index"))
+        self.assertContains(response, "/static/vendor/bootstrap/css/bootstrap.min.css")
+        self.assertContains(response, "/static/vendor/jquery/jquery.min.js")
+        self.assertNotContains(response, "https://")
+
+    def test_missing_bootstrap_falls_back_to_the_cdn(self):
+        with mock.patch.dict(
+            "django.contrib.staticfiles.storage.staticfiles_storage.hashed_files",
+            {"vendor/jquery/jquery.min.js": "vendor/jquery/jquery.0123.min.js"},
+        ):
+            response = self.client.get(reverse("my_notes:index"))
+        self.assertContains(response, vendor.BOOTSTRAP_URL + "css/bootstrap.min.css")
+        self.assertContains(response, vendor.BOOTSTRAP_FILES["js/bootstrap.min.js"])
+        self.assertContains(response, "/static/vendor/jquery/jquery.0123.min.js")
+
+    def test_collected_files_are_fingerprinted_compressed_and_immutable(self):
+        source = tempfile.TemporaryDirectory()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        with open(os.path.join(source.name, "site.css"), "w") as file:
+            file.write("body { margin: 0; }\n" * 100)
+
+        with override_settings(
+            STATIC_ROOT=root.name,
+            STATICFILES_DIRS=[source.name],
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+        ):
+            call_command("collectstatic", interactive=False, stdout=StringIO())
+            url = static("site.css")
+            self.assertRegex(url, r"^/static/site\.[0-9a-f]{12}\.css$")
+            name = url[len("/static/") :]
+            self.assertTrue(os.path.exists(os.path.join(root.name, name + ".gz")))
+
+            response = Client().get(url, HTTP_ACCEPT_ENCODING="gzip")
+            response.close()
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            response["Cache-Control"], "max-age=315360000, public, immutable"
+        )
+
+
+class CompressionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser", password="123")
+        cls.topic = Topic.objects.create(text="Big topic", owner=cls.user)
+        for number in range(30):
+            Entry.objects.create(
+                topic=cls.topic, owner=cls.user, text=f"entry number {number}"
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="testuser", password="123")
+        self.url = reverse("my_notes:topic", args=(self.topic.id,))
+
+    def test_gzips_pages_and_weakens_the_etag(self):
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertEqual(response["ETag"], "W/" + plain["ETag"])
+
+        response = self.client.get(
+            self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_streams_are_compressed_incrementally(self):
+        url = reverse("my_notes:export", args=("ndjson",))
+        plain = b"".join(self.client.get(url).streaming_content)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), plain)
+
+    def test_streams_are_flushed_in_blocks(self):
+        middleware = CompressionMiddleware(lambda request: None)
+        middleware.stream_flush_size = 1000
+        rows = [b'{"text": "row %d of the export"}\n' % number for number in range(500)]
+        parts = list(middleware.compress_stream(compression.GzipEncoder(), rows))
+        self.assertEqual(gzip.decompress(b"".join(parts)), b"".join(rows))
+        # One flush per 1000 bytes of rows, not one per row.
+        self.assertLess(len(parts), len(rows) / 10)
+
+    def test_skips_refused_small_and_binary_responses(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        response = Client().get(
+            reverse("my_notes:new_topic"), HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        response = self.client.get(
+            reverse("my_notes:export", args=("markdown",)), HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_pages_with_csrf_tokens_get_padded_gzip_only(self):
+        url = reverse("my_notes:new_entry", args=(self.topic.id,))
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="br, gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn(b"csrfmiddlewaretoken", gzip.decompress(response.content))
+        self.assertTrue(response.content[3] & gzip.FNAME)
+
+    @skipIf(compression.brotli is None, "brotli is not installed")
+    def test_prefers_brotli(self):
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(compression.brotli.decompress(response.content), plain.content)
+
+    def test_negotiate(self):
+        encodings = ("br", "gzip")
+        self.assertEqual(compression.negotiate("gzip, br", encodings), "br")
+        self.assertEqual(compression.negotiate("br;q=0, gzip", encodings), "gzip")
+        self.assertEqual(compression.negotiate("*", encodings), "br")
+        self.assertIsNone(compression.negotiate("identity", encodings))
+        self.assertIsNone(compression.negotiate("", encodings))
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser", password="123")
+        cls.other = User.objects.create_user(username="other", password="123")
+        cls.topics = [
+            Topic.objects.create(text=f"Topic {number}", owner=cls.user)
+            for number in range(3)
+        ]
+        cls.entries = [
+            Entry.objects.create(
+                topic=cls.topics[0], owner=cls.user, text=f"entry {number}"
+            )
+            for number in range(5)
+        ]
+        cls.foreign = Topic.objects.create(text="Not yours", owner=cls.other)
+
+    def setUp(self):
+        self.client.login(username="testuser", password="123")
+        self.entries_url = reverse("my_notes:api_entries", args=(self.topics[0].id,))
+
+    def get_json(self, url, status=200, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response["Content-Type"], "application/json")
+        return json.loads(response.content)
+
+    def test_topics_of_the_user_without_model_instances(self):
+        with mock.patch.object(Topic, "from_db", side_effect=AssertionError):
+            data = self.get_json(reverse("my_notes:api_topics"))
+        self.assertEqual(
+            [topic["text"] for topic in data["results"]],
+            ["Topic 0", "Topic 1", "Topic 2"],
+        )
+        self.assertEqual(data["results"][0]["entry_count"], 5)
+        self.assertEqual(set(data["results"][0]), set(api.TOPIC_FIELDS))
+        self.assertIsNone(data["next"])
+
+    def test_entries_are_paged_with_cursors(self):
+        seen = []
+        data = self.get_json(self.entries_url, limit=2)
+        while True:
+            seen.extend(entry["id"] for entry in data["results"])
+            if data["next"] is None:
+                break
+            data = self.get_json(self.entries_url, limit=2, after=data["next"])
+        self.assertEqual(seen, [entry.id for entry in reversed(self.entries)])
+        data = self.get_json(self.entries_url, limit=2, before=data["previous"])
+        self.assertEqual(len(data["results"]), 2)
+
+    def test_sparse_fields(self):
+        data = self.get_json(self.entries_url, fields="id,preview")
+        self.assertEqual(
+            data["results"][0], {"id": self.entries[-1].id, "preview": "entry 4"}
+        )
+
+    def test_errors(self):
+        self.get_json(self.entries_url, 400, fields="id,secret")
+        self.get_json(self.entries_url, 400, limit="many")
+        self.get_json(self.entries_url, 400, after="not-a-cursor")
+        self.get_json(reverse("my_notes:api_entries", args=(self.foreign.id,)), 404)
+        self.client.logout()
+        self.get_json(reverse("my_notes:api_topics"), 401)
+
+    def test_fallback_encoder_matches_orjson(self):
+        data = {"date_added": self.entries[0].date_added, "text": "ü"}
+        with mock.patch.object(api, "orjson", None):
+            fallback = api.dumps(data)
+        self.assertEqual(json.loads(fallback), json.loads(api.dumps(data)))
+        self.assertTrue(json.loads(fallback)["date_added"].endswith("Z"))
+
+
+class BatchEntriesApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser", password="123")
+        other = User.objects.create_user(username="other", password="123")
+        cls.first = Topic.objects.create(text="First", owner=cls.user)
+        cls.second = Topic.objects.create(text="Second", owner=cls.user)
+        cls.foreign = Topic.objects.create(text="Not yours", owner=other)
+
+    def setUp(self):
+        self.client.login(username="testuser", password="123")
+        self.url = reverse("my_notes:api_batch")
+
+    def post(self, entries, status):
+        response = self.client.post(
+            self.url, {"entries": entries}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status, response.content)
+        return json.loads(response.content)
+
+    def batch(self, size, prefix="key"):
+        return [
+            {
+                "topic_id": (self.first, self.second)[number % 2].id,
+                "text": f"offline note {number}",
+                "client_key": f"{prefix}-{number}",
+            }
+            for number in range(size)
+        ]
+
+    def test_creates_entries_across_topics(self):
+        data = self.post(self.batch(6), 201)
+        self.assertEqual(len(data["results"]), 6)
+        self.assertTrue(all(result["created"] for result in data["results"]))
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.entry_count, 3)
+        entry = Entry.objects.get(id=data["results"][0]["id"])
+        self.assertEqual((entry.text, entry.client_key), ("offline note 0", "key-0"))
+        self.assertEqual(entry.html, "<p>offline note 0</p>")
+
+    def test_retries_do_not_duplicate(self):
+        first = self.post(self.batch(4), 201)
+        again = self.post(self.batch(6), 201)
+        self.assertEqual(
+            again["results"][:4],
+            [{**result, "created": False} for result in first["results"]],
+        )
+        self.assertTrue(all(result["created"] for result in again["results"][4:]))
+        self.post(self.batch(6), 200)
+        self.assertEqual(Entry.objects.filter(owner=self.user).count(), 6)
+
+    def test_invalid_entries_reject_the_whole_batch(self):
+        entries = self.batch(4)
+        entries[1]["text"] = ""
+        entries[2]["topic_id"] = self.foreign.id
+        entries[3]["client_key"] = "key-0"
+        data = self.post(entries, 400)
+        self.assertEqual(
+            [(error["index"], list(error["errors"])) for error in data["errors"]],
+            [(1, ["text"]), (2, ["topic_id"]), (3, ["client_key"])],
+        )
+        self.assertFalse(Entry.objects.exists())
+        self.assertEqual(self.post("nope", 400)["error"][:8], "Expected")
+
+    def test_booleans_are_not_topic_ids(self):
+        entries = self.batch(1)
+        entries[0]["topic_id"] = True
+        data = self.post(entries, 400)
+        self.assertEqual(list(data["errors"][0]["errors"]), ["topic_id"])
+
+    def test_concurrent_save_of_the_same_keys_conflicts(self):
+        with mock.patch("my_notes.views.insert_entries", side_effect=IntegrityError):
+            data = self.post(self.batch(2), 409)
+        self.assertIn("retry", data["error"])
+        self.assertFalse(Entry.objects.exists())
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        with CaptureQueriesContext(connection) as small:
+            self.post(self.batch(10, "small"), 201)
+        with CaptureQueriesContext(connection) as large:
+            self.post(self.batch(100, "large"), 201)
+        self.assertEqual(len(small), len(large))
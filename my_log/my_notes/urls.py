@@ -1,15 +1,34 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
 app_name = "my_notes"
 
+if settings.MY_NOTES_ASYNC_VIEWS:
+    from .async_views import export, index, theme, topics
+else:
+    index = views.Index.as_view()
+    topics = views.Topics.as_view()
+    theme = views.Theme.as_view()
+    export = views.Export.as_view()
+
 urlpatterns = [
-    path("", views.Index.as_view(), name="index"),
-    path("topics/", views.Topics.as_view(), name="topics"),
-    path("topic/<int:topic_id>", views.Theme.as_view(), name="topic"),
+    path("", index, name="index"),
+    path("topics/", topics, name="topics"),
+    path("topic/<int:topic_id>", theme, name="topic"),
+    path("search/", views.Search.as_view(), name="search"),
+    path("export/<str:file_format>/", export, name="export"),
     path("new_topic/", views.NewTopic.as_view(), name="new_topic"),
     path("new_entry/<int:topic_id>", views.NewEntry.as_view(), name="new_entry"),
     path("edit_entry/<int:entry_id>", views.EditEntry.as_view(), name="edit_entry"),
     path("<int:pk>/delete/", views.DeleteEntry.as_view(), name="delete_entry"),
+    path("api/topics/", views.TopicsApi.as_view(), name="api_topics"),
+    path(
+        "api/topics/<int:topic_id>/entries/",
+        views.EntriesApi.as_view(),
+        name="api_entries",
+    ),
+    path("api/entries/batch/", views.BatchEntriesApi.as_view(), name="api_batch"),
+    path("api/changes/", views.ChangesApi.as_view(), name="api_changes"),
 ]
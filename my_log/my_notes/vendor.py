@@ -0,0 +1,38 @@
+"""Third-party assets served from config/static/vendor, see vendor_static."""
+from functools import lru_cache
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+BOOTSTRAP_URL = "https://stackpath.bootstrapcdn.com/bootstrap/3.4.1/"
+
+# Files under vendor/bootstrap, with the hashes bootstrap3 checks the CDN
+# copies against. The fonts have no published hashes.
+BOOTSTRAP_FILES = {
+    "css/bootstrap.min.css": (
+        "sha384-HSMxcRTRxnN+Bdg0JdbxYKrThecOKuH5zCYotlSAcp1+c8xmyTe9GYg1l9a69psu"
+    ),
+    "js/bootstrap.min.js": (
+        "sha384-aJ21OjlMXNL5UyIl/XNwTMqvzeRMZH2w8c5cRVpzpU8Y5bApTppSuUkhZXN0VxHd"
+    ),
+    "fonts/glyphicons-halflings-regular.eot": None,
+    "fonts/glyphicons-halflings-regular.svg": None,
+    "fonts/glyphicons-halflings-regular.ttf": None,
+    "fonts/glyphicons-halflings-regular.woff": None,
+    "fonts/glyphicons-halflings-regular.woff2": None,
+}
+
+
+@lru_cache(maxsize=None)
+def is_vendored(name):
+    """Whether the static file ``name`` exists, collected or not."""
+    hashed_files = getattr(staticfiles_storage, "hashed_files", None)
+    if hashed_files:
+        return name in hashed_files
+    return finders.find(name) is not None
+
+
+def cdn_fallback(name):
+    """The CDN url and integrity hash of a vendored Bootstrap file."""
+    path = name[len("vendor/bootstrap/") :]
+    return BOOTSTRAP_URL + path, BOOTSTRAP_FILES[path]
@@ -1,44 +1,215 @@
-from datetime import datetime
+import hashlib
 
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import Http404, HttpResponseRedirect
+from django.contrib.auth.views import redirect_to_login
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, Max, Subquery
+from django.http import Http404, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse, reverse_lazy
+from django.utils import timezone
 from django.views import View
+from django.views.decorators.http import condition
 from django.views.generic import DeleteView, TemplateView
 
+from . import api, export, search, sharding, sync
+from .bulk import insert_entries
 from .forms import EntryForm, TopicForm
 #
-from .models import Entry, Topic
+from .models import Entry, Tombstone, Topic
+from .pagination import InvalidCursor, KeysetPaginator, MergedKeysetPaginator
 
 # My Class Based views.
 
 
+class ConditionalGetMixin:
+    """Answer If-None-Match / If-Modified-Since with 304 before rendering.
+
+    Subclasses return (etag parts, last modified) from get_validators(); the
+    parts are hashed together with the user and the query string.
+    """
+
+    def get_validators(self):
+        return None, None
+
+    def _validators(self):
+        if not hasattr(self, "_validator_cache"):
+            parts, last_modified = self.get_validators()
+            etag = None
+            if parts is not None:
+                parts = (self.request.user.pk, self.request.GET.urlencode(), *parts)
+                etag = hashlib.md5(repr(parts).encode()).hexdigest()
+            self._validator_cache = etag, last_modified
+        return self._validator_cache
+
+    def get(self, request, *args, **kwargs):
+        view = condition(
+            etag_func=lambda *args, **kwargs: self._validators()[0],
+            last_modified_func=lambda *args, **kwargs: self._validators()[1],
+        )(super().get)
+        return view(request, *args, **kwargs)
+
+
 class Index(TemplateView):
+    read_from_replica = True
     template_name = "my_notes/index.html"
 
 
-class Topics(TemplateView):
+class Topics(ConditionalGetMixin, TemplateView):
+    read_from_replica = True
+    login_url = "/users/login/"
     template_name = "my_notes/topics.html"
+    paginate_by = 20
+
+    def is_public(self):
+        if not settings.MY_NOTES_PUBLIC_TOPICS:
+            return False
+        return not self.request.user.is_authenticated or "public" in self.request.GET
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated and not self.is_public():
+            return redirect_to_login(request.get_full_path(), self.login_url)
+        return super().get(request, *args, **kwargs)
+
+    def get_topics(self):
+        """Return one queryset per database the listed topics live on."""
+        if self.is_public():
+            return [Topic.objects.using(db).all() for db in sharding.databases()]
+        return [Topic.objects.for_user(self.request.user)]
+
+    def get_validators(self):
+        # Over every user's topics the aggregates would scan the whole table on
+        # each anonymous visit.
+        if self.is_public():
+            return None, None
+        (topics,) = self.get_topics()
+        # A deleted topic leaves nothing behind but its tombstone.
+        tombstones = (
+            Tombstone.objects.filter(owner=self.request.user, kind="topic")
+            .order_by("-deleted_at")
+            .values("deleted_at")[:1]
+        )
+        # Entry writes touch updated_at of their topic too.
+        stats = topics.aggregate(
+            count=Count("id"),
+            updated=Max("updated_at"),
+            deleted=Max(Subquery(tombstones)),
+        )
+        stamps = [stamp for stamp in (stats["updated"], stats["deleted"]) if stamp]
+        return tuple(stats.values()), max(stamps, default=None)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["themes"] = Topic.objects.order_by("date_added")
+        public = self.is_public()
+        topics = self.get_topics()
+        if len(topics) == 1:
+            paginator = KeysetPaginator(topics[0], self.paginate_by, descending=False)
+        else:
+            paginator = MergedKeysetPaginator(
+                topics, self.paginate_by, descending=False
+            )
+        try:
+            page = paginator.page(
+                after=self.request.GET.get("after"),
+                before=self.request.GET.get("before"),
+            )
+        except InvalidCursor:
+            raise Http404("Invalid page cursor.")
+        context["public"] = public
+        context["page"] = page
+        context["themes"] = page.object_list
         return context
 
 
-class Theme(LoginRequiredMixin, TemplateView):
+class Theme(LoginRequiredMixin, ConditionalGetMixin, TemplateView):
+    read_from_replica = True
     login_url = "/users/login/"
     template_name = "my_notes/topic.html"
+    paginate_by = 20
+
+    def get_topic(self):
+        # Shared by the validators and the context, so the topic is read once.
+        if not hasattr(self, "topic"):
+            self.topic = get_object_or_404(
+                Topic.objects.for_user(self.request.user), id=self.kwargs["topic_id"]
+            )
+        return self.topic
+
+    def get_validators(self):
+        topic = self.get_topic()
+        # The version is bumped by every entry write, including the admin's.
+        parts = (topic.id, topic.seq, topic.version)
+        return parts, topic.updated_at
 
     def get_context_data(self, topic_id, **kwargs):
-        topic = get_object_or_404(Topic, id=topic_id)
+        topic = self.get_topic()
         context = super().get_context_data(**kwargs)
+        paginator = KeysetPaginator(topic.topic.defer("text"), self.paginate_by)
+        try:
+            page = paginator.page(
+                after=self.request.GET.get("after"),
+                before=self.request.GET.get("before"),
+            )
+        except InvalidCursor:
+            raise Http404("Invalid page cursor.")
         context["topic"] = topic
-        context["entries"] = topic.topic.order_by("-date_added")
+        context["page_key"] = self.request.GET.urlencode()
+        context["fragment_timeout"] = settings.MY_NOTES_FRAGMENT_CACHE_TIMEOUT
+        context["page"] = page
+        context["entries"] = page.object_list
         return context
 
 
+class Search(LoginRequiredMixin, TemplateView):
+    login_url = "/users/login/"
+    template_name = "my_notes/search.html"
+    paginate_by = 20
+    # Deeper pages are clamped, so OFFSET stays small and in range.
+    max_pages = 50
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "").strip()
+        try:
+            page_number = int(self.request.GET.get("page", 1))
+        except ValueError:
+            raise Http404("Invalid page number.")
+        page_number = min(max(page_number, 1), self.max_pages)
+        entries = Entry.objects.for_user(self.request.user)
+        entry_ids = search.search_entry_ids(
+            self.request.user.id,
+            query,
+            limit=self.paginate_by + 1,
+            offset=(page_number - 1) * self.paginate_by,
+            using=entries.db,
+        )
+        entries = entries.defer("text", "html").in_bulk(entry_ids[: self.paginate_by])
+        context["query"] = query
+        context["page_number"] = page_number
+        context["has_next"] = (
+            len(entry_ids) > self.paginate_by and page_number < self.max_pages
+        )
+        context["results"] = [entries[pk] for pk in entry_ids if pk in entries]
+        return context
+
+
+class Export(LoginRequiredMixin, View):
+    login_url = "/users/login/"
+
+    def get(self, request, file_format):
+        if file_format not in export.EXPORTERS:
+            raise Http404("Unknown export format.")
+        content_type, extension = export.FORMATS[file_format]
+        chunks = export.EXPORTERS[file_format](
+            export.user_entries(request.user), export.empty_topics(request.user)
+        )
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        filename = f"learning-log.{extension}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
 class NewTopic(LoginRequiredMixin, View):
     login_url = "/users/login/"
     form_class = TopicForm
@@ -54,7 +225,8 @@ class NewTopic(LoginRequiredMixin, View):
         if form.is_valid():
             new_theme = form.save(commit=False)
             new_theme.owner = request.user
-            new_theme.save()
+            with transaction.atomic():
+                new_theme.save()
             return HttpResponseRedirect(reverse("my_notes:topics"))
 
 
@@ -64,21 +236,20 @@ class NewEntry(LoginRequiredMixin, View):
     template_name = "my_notes/new_entry.html"
 
     def get(self, request, topic_id):
-        topic = Topic.objects.get(id=topic_id)
-        if topic.owner != request.user:
-            raise Http404("You can't add entries outside your own topics.")
+        topic = get_object_or_404(Topic.objects.for_user(request.user), id=topic_id)
         form = self.form_class()
         context = {"topic": topic, "form": form}
         return render(request, self.template_name, context)
 
     def post(self, request, topic_id):
-        topic = Topic.objects.get(id=topic_id)
+        topic = get_object_or_404(Topic.objects.for_user(request.user), id=topic_id)
         form = self.form_class(data=request.POST)
         if form.is_valid():
             entry = form.save(commit=False)
             entry.topic = topic
-            entry.owner = topic.owner
-            entry.save()
+            entry.owner = request.user
+            with transaction.atomic():
+                entry.save()
             return HttpResponseRedirect(reverse("my_notes:topic", args=(topic_id,)))
 
 
@@ -88,22 +259,21 @@ class EditEntry(LoginRequiredMixin, View):
     form_class = EntryForm
 
     def get(self, request, entry_id):
-        entry = Entry.objects.get(id=entry_id)
-        if entry.owner != request.user:
-            raise Http404("You can edit your own entries only.")
+        entry = get_object_or_404(Entry.objects.for_user(request.user), id=entry_id)
         topic = entry.topic
         form = self.form_class(instance=entry)
         context = {"entry": entry, "topic": topic, "form": form}
         return render(request, self.template_name, context)
 
     def post(self, request, entry_id):
-        entry = Entry.objects.get(id=entry_id)
-        entry.date_added = datetime.now()
+        entry = get_object_or_404(Entry.objects.for_user(request.user), id=entry_id)
+        entry.date_added = timezone.now()
         form = self.form_class(instance=entry, data=request.POST)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
             return HttpResponseRedirect(
-                reverse("my_notes:topic", args=(entry.topic.id,))
+                reverse("my_notes:topic", args=(entry.topic_id,))
             )
 
 
@@ -111,8 +281,224 @@ class DeleteEntry(LoginRequiredMixin, DeleteView):
     login_url = "/users/login/"
     model = Entry
 
+    def get_queryset(self):
+        return Entry.objects.for_user(self.request.user)
+
     def get_success_url(self):
-        entry_id = self.kwargs["pk"]
-        topic = Entry.objects.get(pk=entry_id).topic
-        topic_id = topic.id
+        topic_id = self.object.topic_id
         return reverse_lazy("my_notes:topic", kwargs={"topic_id": topic_id})
+
+    def delete(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(request, *args, **kwargs)
+
+
+class ApiLoginRequiredMixin(LoginRequiredMixin):
+    def handle_no_permission(self):
+        return api.JsonResponse({"error": "Authentication required."}, status=401)
+
+
+class ApiView(ApiLoginRequiredMixin, View):
+    """Base of the JSON read API.
+
+    Subclasses define ``get_queryset()``, returning the rows to list. Rows are
+    read with values() and paged with keyset cursors; ``?fields=`` picks the
+    keys of each result, ``?after=``/``?before=`` the page.
+    """
+
+    read_from_replica = True
+    fields = ()
+    paginate_by = 50
+    max_page_size = 200
+    descending = True
+
+    def get(self, request, *args, **kwargs):
+        try:
+            fields = api.selected_fields(request.GET.get("fields"), self.fields)
+        except api.InvalidFields as error:
+            return api.JsonResponse({"error": str(error)}, status=400)
+        try:
+            per_page = int(request.GET.get("limit", self.paginate_by))
+        except ValueError:
+            per_page = 0
+        if per_page < 1:
+            return api.JsonResponse(
+                {"error": "limit must be a positive integer."}, status=400
+            )
+        per_page = min(per_page, self.max_page_size)
+
+        # The cursor needs date_added and id even if the client didn't ask.
+        columns = dict.fromkeys((*fields, "date_added", "id"))
+        paginator = KeysetPaginator(
+            self.get_queryset().values(*columns), per_page, descending=self.descending
+        )
+        try:
+            page = paginator.page(
+                after=request.GET.get("after"), before=request.GET.get("before")
+            )
+        except InvalidCursor:
+            return api.JsonResponse({"error": "Invalid page cursor."}, status=400)
+        return api.JsonResponse(
+            {
+                "results": [{field: row[field] for field in fields} for row in page],
+                "next": page.next_cursor,
+                "previous": page.previous_cursor,
+            }
+        )
+
+
+class TopicsApi(ApiView):
+    fields = api.TOPIC_FIELDS
+    descending = False
+
+    def get_queryset(self):
+        return Topic.objects.for_user(self.request.user)
+
+
+class EntriesApi(ApiView):
+    fields = api.ENTRY_FIELDS
+
+    def get(self, request, topic_id):
+        # The same ownership check as Theme, without loading the topic.
+        if not Topic.objects.for_user(request.user).filter(id=topic_id).exists():
+            return api.JsonResponse({"error": "Topic not found."}, status=404)
+        return super().get(request, topic_id)
+
+    def get_queryset(self):
+        return Entry.objects.filter(
+            owner=self.request.user, topic_id=self.kwargs["topic_id"]
+        )
+
+
+class BatchEntriesApi(ApiLoginRequiredMixin, View):
+    """Create entries in any of the user's topics, many at a time.
+
+    The body is ``{"entries": [{"topic_id", "text", "client_key"}, ...]}``.
+    Each entry is validated with EntryForm; either all of them are saved, in
+    one transaction, or none are. Entries whose client_key an earlier request
+    saved are reported instead of created again, so retrying is safe.
+    """
+
+    max_batch_size = 500
+
+    def post(self, request):
+        try:
+            items = api.loads(request.body)["entries"]
+            if not all(isinstance(item, dict) for item in items):
+                raise TypeError
+        except (ValueError, LookupError, TypeError):
+            return api.JsonResponse(
+                {"error": 'Expected a JSON object with an "entries" list.'},
+                status=400,
+            )
+        if len(items) > self.max_batch_size:
+            return api.JsonResponse(
+                {"error": f"At most {self.max_batch_size} entries per batch."},
+                status=400,
+            )
+
+        keys = [item.get("client_key") for item in items]
+        topic_ids = {item.get("topic_id") for item in items} - {None}
+        owned = set(
+            Topic.objects.for_user(request.user)
+            .filter(id__in=[pk for pk in topic_ids if type(pk) is int])
+            .values_list("id", flat=True)
+        )
+        entries = Entry.objects.filter(owner=request.user)
+        saved = set(
+            entries.filter(
+                client_key__in=[key for key in keys if isinstance(key, str)]
+            ).values_list("client_key", flat=True)
+        )
+
+        new_entries, errors, seen = [], [], set()
+        for index, item in enumerate(items):
+            key, item_errors = item.get("client_key"), {}
+            if not isinstance(key, str) or not 0 < len(key) <= 64:
+                item_errors["client_key"] = ["Give a key of 1 to 64 characters."]
+            elif key in seen:
+                item_errors["client_key"] = ["This key is already in the batch."]
+            else:
+                seen.add(key)
+            topic_id = item.get("topic_id")
+            # Not isinstance(): JSON true and false load as bool, an int.
+            if type(topic_id) is not int or topic_id not in owned:
+                item_errors["topic_id"] = ["Topic not found."]
+            form = EntryForm(data={"text": item.get("text")})
+            if not form.is_valid():
+                for field, field_errors in form.errors.get_json_data().items():
+                    item_errors[field] = [error["message"] for error in field_errors]
+            if item_errors:
+                errors.append({"index": index, "errors": item_errors})
+            elif key not in saved:
+                entry = form.save(commit=False)
+                entry.topic_id = topic_id
+                entry.owner = request.user
+                entry.client_key = key
+                new_entries.append(entry)
+        if errors:
+            return api.JsonResponse({"errors": errors}, status=400)
+
+        using = router.db_for_write(Entry, instance=request.user)
+        try:
+            with transaction.atomic(using=using):
+                insert_entries(new_entries, using=using)
+        except IntegrityError:
+            # Another request saved some of the same keys meanwhile.
+            return api.JsonResponse(
+                {"error": "Some of these entries were saved concurrently; retry."},
+                status=409,
+            )
+        ids = dict(
+            entries.using(using)
+            .filter(client_key__in=keys)
+            .values_list("client_key", "id")
+        )
+        return api.JsonResponse(
+            {
+                "results": [
+                    {"client_key": key, "id": ids[key], "created": key not in saved}
+                    for key in keys
+                ]
+            },
+            status=201 if new_entries else 200,
+        )
+
+
+class ChangesApi(ApiLoginRequiredMixin, View):
+    """Everything that changed in the user's log since ``?since=<token>``.
+
+    Without a token the whole log is returned. Follow ``next`` while
+    ``has_more`` is true and keep the last one for the next sync. ``reset``
+    means the token is from another database, as after the user's notes were
+    moved to another shard, or older than the pruned tombstones; the client
+    should replace its copy then.
+    """
+
+    paginate_by = 500
+
+    def get(self, request):
+        using = Topic.objects.for_user(request.user).db
+        since, reset = 0, False
+        if request.GET.get("since"):
+            try:
+                database, since = sync.decode_token(request.GET["since"])
+            except sync.InvalidToken:
+                return api.JsonResponse({"error": "Invalid sync token."}, status=400)
+            if database != using or since < sync.pruned_seq(using):
+                since, reset = 0, True
+
+        changes, has_more = sync.changes(request.user, since, self.paginate_by, using)
+        data = {"topics": [], "entries": [], "deleted": []}
+        for seq, kind, row in changes:
+            if kind == "topic":
+                data["topics"].append(row)
+            elif kind == "entry":
+                data["entries"].append(row)
+            else:
+                data["deleted"].append({"type": row["kind"], "id": row["object_id"]})
+        last_seq = changes[-1][0] if changes else since
+        data.update(
+            next=sync.encode_token(using, last_seq), has_more=has_more, reset=reset
+        )
+        return api.JsonResponse(data)
@@ -1,3 +1,15 @@
+from django.contrib.auth.models import User
 from django.db import models
 
 # Create your models here.
+
+
+class ShardAssignment(models.Model):
+    """Database alias of a user whose notes were moved off their hash shard."""
+
+    owner = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    database = models.CharField(max_length=100)
+    assigned_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.owner} on {self.database}"